@@ -0,0 +1,64 @@
+"""Category distributions shown on the 'Disease Distribution' page.
+
+Each distribution bins one column of dataset/diabetes.csv with ``np.digitize``
+(``edges[i-1] <= x < edges[i]``, the same intervals the old per-row
+``bin_*`` functions used) and renders a small pie chart to image bytes. The
+figures are closed as soon as they are rendered; the app caches the bytes,
+keyed on the dataset hash and the bin edges.
+"""
+import io
+from collections import namedtuple
+
+import numpy as np
+
+Distribution = namedtuple('Distribution', ['column', 'title', 'edges', 'categories'])
+
+DISTRIBUTIONS = (
+    Distribution('DiabetesPedigreeFunction', 'Diabetes Pedigree Function Distribution', (0.5, 1.0), ('Low', 'Medium', 'High')),
+    Distribution('Glucose', 'Glucose Level Distribution', (100, 140), ('Low', 'Medium', 'High')),
+    Distribution('Age', 'Age Distribution', (30, 50), ('Young', 'Middle-aged', 'Older')),
+    Distribution('BloodPressure', 'Blood Pressure Distribution', (60, 80), ('Low', 'Normal', 'High')),
+)
+
+# Colors for each pie chart
+COLORS = ('#A0C4FF', '#FFB5A7', '#FF99AC')
+
+
+def category_counts(values, edges, categories):
+    """Count ``values`` per bin, most frequent first, empty bins dropped
+    (the order ``Series.value_counts`` gives)."""
+    counts = np.bincount(np.digitize(values, edges), minlength=len(categories))
+    order = np.argsort(-counts, kind='stable')
+    order = order[counts[order] > 0]
+    return [categories[i] for i in order], counts[order]
+
+
+def render_pie_chart(labels, counts, title, colors=COLORS, size=(2, 2), fmt='png', dpi=200):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=size)
+    try:
+        ax.pie(
+            counts,
+            labels=labels,
+            autopct='%1.1f%%',
+            startangle=140,
+            colors=colors,
+            wedgeprops={'edgecolor': 'white', 'linewidth': 1.2},
+            textprops={'fontsize': 8}
+        )
+        ax.set_title(title, fontweight="bold", fontsize=10, color="#444444")
+        buf = io.BytesIO()
+        fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+        return buf.getvalue()
+    finally:
+        plt.close(fig)
+
+
+def render_distribution_charts(df, distributions=DISTRIBUTIONS, fmt='png'):
+    """Return ``[(title, image bytes), ...]`` for every distribution."""
+    charts = []
+    for dist in distributions:
+        labels, counts = category_counts(np.asarray(df[dist.column]), dist.edges, dist.categories)
+        charts.append((dist.title, render_pie_chart(labels, counts, dist.title, fmt=fmt)))
+    return charts
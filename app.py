@@ -1,19 +1,112 @@
-import os
-import pickle
 import streamlit as st
 from streamlit_option_menu import option_menu
-import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+from model_registry import ModelRegistry
+from model_artifact import load_model, resolve_model_path
+from prediction_cache import PredictionCache
+from dataset_cache import dataset_version, load_dataset
+from explanations import Explainer
+from similar_patients import cohort_source, load_index
+from specs import SPECS
+from stage_timings import from_environment
+from drift_monitor import from_timings
+import shadow
 # Set page configuration
 st.set_page_config(page_title="Health Assistant", layout="wide", page_icon="🧑‍⚕️")
 
-# Load the saved models
-working_dir = os.path.dirname(os.path.abspath(__file__))
-diabetes_model = pickle.load(open(f'{working_dir}/saved_models/diabetes_model.sav', 'rb'))
-heart_disease_model = pickle.load(open(f'{working_dir}/saved_models/heart_disease_model.sav', 'rb'))
-parkinsons_model = pickle.load(open(f'{working_dir}/saved_models/parkinsons_model.sav', 'rb'))
+# Load the saved models lazily, once per process, shared by every session
+@st.cache_resource
+def get_model_registry():
+    return ModelRegistry(loader=load_model, resolve=resolve_model_path)
+
+model_registry = get_model_registry()
+
+# Cache of prediction results keyed on the parsed inputs, shared by every session
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(maxsize=10_000, ttl=3600)
+
+prediction_cache = get_prediction_cache()
+
+# Opt-in per-stage timing histograms (see stage_timings.py), one exporter per process
+@st.cache_resource
+def get_stage_timings():
+    return from_environment()
+
+timings = get_stage_timings()
+
+# Drift of the page inputs from dataset/, monitored and exported along with the timings
+@st.cache_resource
+def get_drift_monitor():
+    return from_timings(timings)
+
+drift_monitor = get_drift_monitor()
+
+# Candidate models scored in shadow, off the rerun, for the models listed in HEALTH_APP_SHADOW
+@st.cache_resource
+def get_shadows():
+    return shadow.from_environment(model_registry)
+
+shadows = get_shadows()
+
+def predict(name, user_input):
+    drift_monitor.observe(name, user_input)
+    if name in shadows:
+        shadows[name].submit([user_input])
+    with timings.stage(name, 'model_load'):
+        model, version = model_registry.get_versioned(name)
+    with timings.stage(name, 'predict'):
+        return prediction_cache.get_or_compute(name, version, user_input, lambda: model.predict_one(user_input))
+
+# Per-feature explanations relative to the dataset's average patient, rebuilt when the model changes
+@st.cache_resource(max_entries=8)
+def get_explainer(name, model_version):
+    return Explainer.from_dataset(name, model_registry.get(name))
+
+def explain(name, user_input, k=3):
+    with timings.stage(name, 'explain'):
+        version = model_registry.version(name)
+        return get_explainer(name, version).explain_one(user_input, k)
+
+def describe_drivers(drivers):
+    factors = ', '.join(f"**{d.feature}** = {d.value:g} ({'raises' if d.contribution > 0 else 'lowers'} risk, {d.contribution:+.2f})"
+                        for d in drivers)
+    return f"Main factors compared with the average patient: {factors}"
+
+# Nearest patients of the reference dataset, or of the cohort CSV set in
+# HEALTH_APP_NEIGHBORS_<MODEL>, from its persisted index (see similar_patients.py)
+@st.cache_resource(max_entries=8)
+def get_neighbor_index(name, source, data_version):
+    return load_index(name, source)
+
+def similar_cases(name, user_input, k=5):
+    with timings.stage(name, 'neighbors'):
+        source = cohort_source(name)
+        return get_neighbor_index(name, source, dataset_version(name, source)).similar(user_input, k)
+
+def show_similar_cases(name, cases):
+    spec = SPECS[name]
+    positive = sum(case.outcome == 1 for case in cases)
+    with st.expander(f"Most similar patients in the reference data: {positive} of {len(cases)} had the condition"):
+        table = {'Distance': [round(case.distance, 2) for case in cases]}
+        for j, feature in enumerate(spec.features):
+            table[feature] = [case.values[j] for case in cases]
+        table['Outcome'] = [spec.labels[case.outcome] for case in cases]
+        st.dataframe(table, hide_index=True)
+
+# Disease distribution charts, rendered once per dataset version and bin layout
+@st.cache_data(max_entries=4)
+def get_distribution_charts(dataset_digest, distributions):
+    # analytics imports matplotlib, which only this page needs
+    from analytics import render_distribution_charts
+    return render_distribution_charts(load_dataset('diabetes'), distributions)
+
+# Voice measures of an uploaded recording, extracted once per file
+@st.cache_data(max_entries=16)
+def get_voice_features(wav_bytes):
+    # voice_features imports scipy, which only the Parkinson's page needs
+    import io
+    from voice_features import extract_wav
+    return extract_wav(io.BytesIO(wav_bytes))
 
 # Custom CSS for modern styling
 st.markdown("""
@@ -259,20 +352,27 @@ elif selected == 'Diabetes Prediction':
 
     if st.button('Predict Diabetes'):
         user_input = [Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age]
-        if all(x >= 0 for x in user_input):
-            diab_prediction = diabetes_model.predict([user_input])
-            result = 'The Person is Diabetic' if diab_prediction[0] == 1 else 'Not Diabetic'
-            st.markdown(f"<div class='result'>{result}</div>", unsafe_allow_html=True)
-
-            if result == 'The Person is Diabetic':
-                st.markdown("<div class='recovery'><strong>Recovery and Management Tips</strong></div>", unsafe_allow_html=True)
-                st.markdown("""
-                    - **Maintain a balanced diet**: Include fiber, whole grains, and lean proteins.
-                    - **Exercise regularly**: Aim for moderate exercise most days.
-                    - **Monitor blood sugar levels**.
-                    - **Stay hydrated**.
-                    - **Get adequate sleep**: 7-8 hours.
-                """)
+        with timings.stage('diabetes', 'validate'):
+            valid = all(x >= 0 for x in user_input)
+        if valid:
+            diab_prediction = predict('diabetes', user_input)
+            result = 'The Person is Diabetic' if diab_prediction == 1 else 'Not Diabetic'
+            drivers = explain('diabetes', user_input)
+            cases = similar_cases('diabetes', user_input)
+            with timings.stage('diabetes', 'render'):
+                st.markdown(f"<div class='result'>{result}</div>", unsafe_allow_html=True)
+                st.markdown(describe_drivers(drivers))
+                show_similar_cases('diabetes', cases)
+
+                if result == 'The Person is Diabetic':
+                    st.markdown("<div class='recovery'><strong>Recovery and Management Tips</strong></div>", unsafe_allow_html=True)
+                    st.markdown("""
+                        - **Maintain a balanced diet**: Include fiber, whole grains, and lean proteins.
+                        - **Exercise regularly**: Aim for moderate exercise most days.
+                        - **Monitor blood sugar levels**.
+                        - **Stay hydrated**.
+                        - **Get adequate sleep**: 7-8 hours.
+                    """)
         else:
             st.error("Please enter valid input values.", icon="🚨")
 
@@ -324,20 +424,27 @@ elif selected == 'Heart Disease Prediction':
 
     if st.button('Predict Heart Disease'):
         user_input = [age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal]
-        if all(x >= 0 for x in user_input):
-            heart_prediction = heart_disease_model.predict([user_input])
-            result = 'Has Heart Disease' if heart_prediction[0] == 1 else 'Does Not Have Heart Disease'
-            st.markdown(f"<div class='result'>{result}</div>", unsafe_allow_html=True)
-
-            if result == 'Has Heart Disease':
-                st.markdown("<div class='recovery'><strong>Recovery and Management Tips</strong></div>", unsafe_allow_html=True)
-                st.markdown("""
-                    - **Eat heart-healthy foods**: Include vegetables, fruits, whole grains, and lean proteins.
-                    - **Stay physically active**.
-                    - **Monitor cholesterol and blood pressure**.
-                    - **Quit smoking and avoid excessive alcohol**.
-                    - **Manage stress**.
-                """)
+        with timings.stage('heart', 'validate'):
+            valid = all(x >= 0 for x in user_input)
+        if valid:
+            heart_prediction = predict('heart', user_input)
+            result = 'Has Heart Disease' if heart_prediction == 1 else 'Does Not Have Heart Disease'
+            drivers = explain('heart', user_input)
+            cases = similar_cases('heart', user_input)
+            with timings.stage('heart', 'render'):
+                st.markdown(f"<div class='result'>{result}</div>", unsafe_allow_html=True)
+                st.markdown(describe_drivers(drivers))
+                show_similar_cases('heart', cases)
+
+                if result == 'Has Heart Disease':
+                    st.markdown("<div class='recovery'><strong>Recovery and Management Tips</strong></div>", unsafe_allow_html=True)
+                    st.markdown("""
+                        - **Eat heart-healthy foods**: Include vegetables, fruits, whole grains, and lean proteins.
+                        - **Stay physically active**.
+                        - **Monitor cholesterol and blood pressure**.
+                        - **Quit smoking and avoid excessive alcohol**.
+                        - **Manage stress**.
+                    """)
         else:
             st.error("Please enter valid input values.", icon="🚨")
 
@@ -423,121 +530,63 @@ elif selected == "Parkinson's Prediction":
     with col2:
         PPE = st.text_input('PPE', placeholder='e.g., 0.13')
 
+    recording = st.file_uploader("Or upload a recording of a sustained 'aaah' (WAV) to measure these automatically", type=['wav'])
+
     # Prediction button and result display
     parkinsons_diagnosis = ''
     if st.button("Predict Parkinson's"):
         try:
-            # Convert inputs to float
-            user_input = [
-                float(fo), float(fhi), float(flo), float(Jitter_percent), float(Jitter_Abs),
-                float(RAP), float(PPQ), float(DDP), float(Shimmer), float(Shimmer_dB),
-                float(APQ3), float(APQ5), float(APQ), float(DDA), float(NHR),
-                float(HNR), float(RPDE), float(DFA), float(spread1), float(spread2),
-                float(D2), float(PPE)
-            ]
+            if recording is not None:
+                with timings.stage('parkinsons', 'extract'):
+                    user_input = get_voice_features(recording.getvalue())
+            else:
+                # Convert inputs to float
+                with timings.stage('parkinsons', 'parse'):
+                    user_input = [
+                        float(fo), float(fhi), float(flo), float(Jitter_percent), float(Jitter_Abs),
+                        float(RAP), float(PPQ), float(DDP), float(Shimmer), float(Shimmer_dB),
+                        float(APQ3), float(APQ5), float(APQ), float(DDA), float(NHR),
+                        float(HNR), float(RPDE), float(DFA), float(spread1), float(spread2),
+                        float(D2), float(PPE)
+                    ]
 
             # Make prediction
-            parkinsons_prediction = parkinsons_model.predict([user_input])
+            parkinsons_prediction = predict('parkinsons', user_input)
 
             # Result interpretation and display with modern look
-            if parkinsons_prediction[0] == 1:
+            if parkinsons_prediction == 1:
                 parkinsons_diagnosis = "The person has Parkinson's disease."
             else:
                 parkinsons_diagnosis = "The person does not have Parkinson's disease."
 
-            st.markdown(f"<div class='result'>{parkinsons_diagnosis}</div>", unsafe_allow_html=True)
-
-            # Recovery and management tips
-            if parkinsons_prediction[0] == 1:
-                st.markdown("<div class='recovery'><strong>Recovery and Management Tips</strong></div>", unsafe_allow_html=True)
-                st.markdown("""
-                    - **Regular check-ups**: Consult with a healthcare provider regularly.
-                    - **Physical activity**: Engage in light exercise, like walking or stretching.
-                    - **Medication adherence**: Take medications as prescribed.
-                    - **Balanced diet**: Include fresh fruits, vegetables, and lean proteins.
-                    - **Support system**: Maintain a strong support network of family and friends.
-                """)
-        except ValueError:
-            st.error("Please ensure all fields are filled in correctly with numerical values.", icon="🚨")
-
-# Sample data (use your actual DataFrame)
-data = {
-    'Pregnancies': [6, 1, 8, 1, 0, 5, 3, 10, 2, 8, 4, 10, 10, 1, 5, 7, 0, 7, 1, 1, 3, 8, 7, 9],
-    'Glucose': [148, 85, 183, 89, 137, 116, 78, 115, 197, 125, 110, 168, 139, 189, 166, 100, 118, 107, 103, 115, 126, 99, 196, 119],
-    'BloodPressure': [72, 66, 64, 66, 40, 74, 50, 0, 70, 96, 92, 74, 80, 60, 72, 0, 84, 74, 30, 70, 88, 84, 90, 80],
-    'SkinThickness': [35, 29, 0, 23, 35, 0, 32, 0, 45, 0, 0, 0, 0, 23, 19, 0, 47, 0, 38, 30, 41, 0, 0, 35],
-    'Insulin': [0, 0, 0, 94, 168, 0, 88, 0, 543, 0, 0, 0, 0, 846, 175, 0, 230, 0, 83, 96, 235, 0, 0, 0],
-    'BMI': [33.6, 26.6, 23.3, 28.1, 43.1, 25.6, 31.0, 35.3, 30.5, 0.0, 37.6, 38.0, 27.1, 30.1, 25.8, 30.0, 45.8, 29.6, 43.3, 34.6, 39.3, 35.4, 39.8, 29.0],
-    'DiabetesPedigreeFunction': [0.627, 0.351, 0.672, 0.167, 2.288, 0.201, 0.248, 0.134, 0.158, 0.232, 0.191, 0.537, 1.441, 0.398, 0.587, 0.484, 0.551, 0.254, 0.183, 0.529, 0.704, 0.388, 0.451, 0.263],
-    'Age': [50, 31, 32, 21, 33, 30, 26, 29, 53, 54, 30, 34, 57, 59, 51, 32, 31, 31, 33, 32, 27, 50, 41, 29],
-    'Outcome': [1, 0, 1, 0, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 1, 1, 1, 1, 0, 1, 0, 0, 1, 1]
-}
-
-# Convert the data to a DataFrame
-df = pd.DataFrame(data)
-
-# Binning functions
-def bin_diabetes_pedigree(value):
-    if value < 0.5:
-        return 'Low'
-    elif 0.5 <= value < 1.0:
-        return 'Medium'
-    else:
-        return 'High'
-
-def bin_glucose(value):
-    if value < 100:
-        return 'Low'
-    elif 100 <= value < 140:
-        return 'Medium'
-    else:
-        return 'High'
-
-def bin_age(value):
-    if value < 30:
-        return 'Young'
-    elif 30 <= value < 50:
-        return 'Middle-aged'
-    else:
-        return 'Older'
-
-def bin_blood_pressure(value):
-    if value < 60:
-        return 'Low'
-    elif 60 <= value < 80:
-        return 'Normal'
-    else:
-        return 'High'
-
-# Apply bins to create new columns for each category
-df['DiabetesPedigreeCategory'] = df['DiabetesPedigreeFunction'].apply(bin_diabetes_pedigree)
-df['GlucoseCategory'] = df['Glucose'].apply(bin_glucose)
-df['AgeCategory'] = df['Age'].apply(bin_age)
-df['BloodPressureCategory'] = df['BloodPressure'].apply(bin_blood_pressure)
-
-# Function to create pie chart for a specific category with a fixed small size
-def create_pie_chart(data, title, colors, size=(2, 2)):
-    fig, ax = plt.subplots(figsize=size) 
-    counts = data.value_counts()
-    ax.pie(
-        counts,
-        labels=counts.index,
-        autopct='%1.1f%%',
-        startangle=140,
-        colors=colors,
-        wedgeprops={'edgecolor': 'white', 'linewidth': 1.2},
-        textprops={'fontsize': 8} 
-    )
-    ax.set_title(title, fontweight="bold", fontsize=10, color="#444444")
-    return fig
-
-# Colors for each pie chart
-colors = ['#A0C4FF', '#FFB5A7', '#FF99AC']
-
-# Page selection
-selected = st.sidebar.selectbox("Select a Page", ["Home", "Disease Distribution", "Heart Disease Prediction", "Parkinson's Prediction"])
+            drivers = explain('parkinsons', user_input)
+            cases = similar_cases('parkinsons', user_input)
+            with timings.stage('parkinsons', 'render'):
+                st.markdown(f"<div class='result'>{parkinsons_diagnosis}</div>", unsafe_allow_html=True)
+                if recording is not None:
+                    with st.expander("Measures taken from the recording"):
+                        st.dataframe({'Measure': SPECS['parkinsons'].features, 'Value': user_input}, hide_index=True)
+                st.markdown(describe_drivers(drivers))
+                show_similar_cases('parkinsons', cases)
+
+                # Recovery and management tips
+                if parkinsons_prediction == 1:
+                    st.markdown("<div class='recovery'><strong>Recovery and Management Tips</strong></div>", unsafe_allow_html=True)
+                    st.markdown("""
+                        - **Regular check-ups**: Consult with a healthcare provider regularly.
+                        - **Physical activity**: Engage in light exercise, like walking or stretching.
+                        - **Medication adherence**: Take medications as prescribed.
+                        - **Balanced diet**: Include fresh fruits, vegetables, and lean proteins.
+                        - **Support system**: Maintain a strong support network of family and friends.
+                    """)
+        except ValueError as e:
+            if recording is not None:
+                st.error(f"Could not measure the recording: {e}", icon="🚨")
+            else:
+                st.error("Please ensure all fields are filled in correctly with numerical values.", icon="🚨")
 
-if selected == 'Disease Distribution':
+# Disease Distribution Page
+elif selected == 'Disease Distribution':
     st.markdown("""
     <div class="dis-header">
         <h1>Disease Distribution Analysis by Categories</h1>
@@ -548,7 +597,9 @@ if selected == 'Disease Distribution':
     st.subheader("")
     
     # Display each pie chart in the Disease Distribution section only
-    st.pyplot(create_pie_chart(df['DiabetesPedigreeCategory'], "Diabetes Pedigree Function Distribution", colors, size=(2, 2)))
-    st.pyplot(create_pie_chart(df['GlucoseCategory'], "Glucose Level Distribution", colors, size=(2, 2)))
-    st.pyplot(create_pie_chart(df['AgeCategory'], "Age Distribution", colors, size=(2, 2)))
-    st.pyplot(create_pie_chart(df['BloodPressureCategory'], "Blood Pressure Distribution", colors, size=(2, 2)))
\ No newline at end of file
+    from analytics import DISTRIBUTIONS
+    with timings.stage('distribution', 'charts'):
+        charts = get_distribution_charts(dataset_version('diabetes'), DISTRIBUTIONS)
+    with timings.stage('distribution', 'render'):
+        for title, image in charts:
+            st.image(image)
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""Similar-patient query latency across cohort sizes.
+
+Builds synthetic cohorts by resampling a dataset/ file's rows with a little
+Gaussian noise (5% of each feature's standard deviation, so the cohort keeps
+the dataset's shape without exact duplicates), indexes each one with
+similar_patients.build_index in a temporary directory and times:
+
+``single``    one patient, as a prediction page asks (median of the queries);
+``batch``     ``--batch`` patients per call, per patient;
+
+for the KD-leaf index (``query``) and the blocked brute-force search
+(``scan``). Both must return the same neighbours before anything is timed.
+
+Usage:
+    python benchmarks/bench_neighbors.py [--model parkinsons] [--max-rows 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from dataset_cache import load_dataset  # noqa: E402
+from similar_patients import NeighborIndex, build_index  # noqa: E402
+from specs import SPECS  # noqa: E402
+
+
+def synthetic_cohort(name, n, seed=0):
+    rng = np.random.default_rng(seed)
+    dataset = load_dataset(name)
+    X = dataset.X()
+    picks = rng.integers(0, len(X), n)
+    return X[picks] + rng.normal(0, 0.05, (n, X.shape[1])) * X.std(axis=0), np.asarray(dataset.y)[picks]
+
+
+def median_time(fn, queries):
+    times = []
+    for x in queries:
+        start = time.perf_counter()
+        fn(x)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append',
+                        help='dataset to resample (default: all three)')
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=50, help='single-patient queries timed')
+    parser.add_argument('--batch', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    for name in args.model or sorted(SPECS):
+        dataset = load_dataset(name)
+        queries = dataset.X()[np.random.default_rng(1).integers(0, len(dataset), max(args.queries, args.batch))]
+        print(f"\n{name} ({len(dataset.features)} features), k={args.k}")
+        print(f"{'rows':>9}{'build s':>9}{'single query ms':>17}{'single scan ms':>16}"
+              f"{'batch query us':>16}{'batch scan us':>15}")
+        size = 1_000
+        while size <= args.max_rows:
+            X, y = synthetic_cohort(name, size)
+            with tempfile.TemporaryDirectory() as path:
+                start = time.perf_counter()
+                build_index(path, X, y, dataset.features)
+                build_seconds = time.perf_counter() - start
+                index = NeighborIndex(path)
+
+                check = queries[:20]
+                if not np.array_equal(index.query(check, args.k)[1], index.scan(check, args.k)[1]):
+                    raise AssertionError(f"query and scan disagree on {size} rows")
+
+                single = [q[None] for q in queries[:args.queries]]
+                query_one = median_time(lambda x: index.query(x, args.k), single)
+                scan_one = median_time(lambda x: index.scan(x, args.k), single)
+                batch = queries[:args.batch]
+                start = time.perf_counter()
+                index.query(batch, args.k)
+                query_batch = (time.perf_counter() - start) / len(batch)
+                start = time.perf_counter()
+                index.scan(batch, args.k)
+                scan_batch = (time.perf_counter() - start) / len(batch)
+                del index
+            print(f"{size:>9}{build_seconds:>9.2f}{query_one * 1e3:>17.3f}{scan_one * 1e3:>16.3f}"
+                  f"{query_batch * 1e6:>16.1f}{scan_batch * 1e6:>15.1f}")
+            size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Wall time of one Streamlit rerun of app.py, per page.
+
+Drives the script headlessly through streamlit's AppTest with the sidebar
+menu patched to each page, and reports the first (cold) run and the median of
+the following reruns.
+
+Usage:
+    python benchmarks/bench_rerun.py [--runs 20]
+    python benchmarks/bench_rerun.py --rev HEAD~1   # app.py as of another revision
+
+With ``--rev`` only app.py is taken from the given revision; the modules it
+imports and saved_models/ come from the working tree.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from unittest import mock
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+PAGES = ['Home', 'Diabetes Prediction', 'Heart Disease Prediction', "Parkinson's Prediction", 'Disease Distribution']
+
+
+def time_page(app_path, page, runs):
+    from streamlit.testing.v1 import AppTest
+
+    with mock.patch('streamlit_option_menu.option_menu', return_value=page):
+        at = AppTest.from_file(app_path, default_timeout=120)
+        timings = []
+        for _ in range(runs + 1):
+            start = time.perf_counter()
+            at.run()
+            timings.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(f"{page}: {at.exception[0].message}")
+            # AppTest cannot map the value of a selectbox with format_func back to
+            # its option on rerun; pin them to their default (first) option.
+            for selectbox in at.selectbox:
+                selectbox.select_index(0)
+    return timings[0], statistics.median(timings[1:])
+
+
+def bench(app_path, runs):
+    return {page: time_page(app_path, page, runs) for page in PAGES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=20, help='reruns per page after the first run')
+    parser.add_argument('--rev', help='git revision to take app.py from (default: working tree)')
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore')
+
+    app_path = os.path.join(repo_dir, 'app.py')
+    tmp = None
+    if args.rev:
+        source = subprocess.run(['git', 'show', f'{args.rev}:app.py'], cwd=repo_dir,
+                                check=True, capture_output=True).stdout
+        # next to the real app.py, so relative paths such as saved_models/ resolve
+        fd, tmp = tempfile.mkstemp(prefix='.bench_app_', suffix='.py', dir=repo_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(source)
+        app_path = tmp
+
+    try:
+        results = bench(app_path, args.runs)
+    finally:
+        if tmp:
+            os.remove(tmp)
+
+    print(f"{'page':<28}{'first run (ms)':>16}{'rerun median (ms)':>20}")
+    for page, (first, median) in results.items():
+        print(f"{page:<28}{first * 1e3:>16.1f}{median * 1e3:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Fused screening against three sequential predict calls.
+
+Builds synthetic patient records by sampling every record field from its
+dataset/ column (``age`` from heart.csv) and scores them three ways: one
+fused ``FusedLinearModel.predict`` call, three sklearn ``predict`` calls on each
+model's columns (the .sav pickles, as the pages originally did), and three
+``LinearPredictor.predict`` calls on the served artifacts. Labels of all
+three paths are checked to agree before anything is timed.
+
+Usage:
+    python benchmarks/bench_screening.py [--max-rows 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from dataset_cache import load_dataset  # noqa: E402
+from model_artifact import load_model, resolve_model_path  # noqa: E402
+from model_registry import ModelRegistry, load_pickle  # noqa: E402
+from screening import RECORD_FIELDS, Screener, record_field  # noqa: E402
+from specs import SPECS, model_path  # noqa: E402
+
+
+def synthetic_records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name in SPECS:
+        dataset = load_dataset(name)
+        for feature in dataset.features:
+            field = record_field(name, feature)
+            if field not in columns:
+                columns[field] = dataset[feature][rng.integers(0, len(dataset), n)]
+    return np.stack([columns[f] for f in RECORD_FIELDS], axis=1).astype(np.float64)
+
+
+def best_time(fn, min_seconds=0.5):
+    best, total = float('inf'), 0.0
+    while total < min_seconds:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best, total = min(best, elapsed), total + elapsed
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    screener = Screener(ModelRegistry(loader=load_model, resolve=resolve_model_path))
+    columns = {name: [RECORD_FIELDS.index(record_field(name, f)) for f in spec.features]
+               for name, spec in SPECS.items()}
+    sklearn_models = {name: load_pickle(model_path(name)) for name in SPECS}
+    artifacts = {name: load_model(resolve_model_path(name)) for name in SPECS}
+    X = synthetic_records(args.max_rows)
+
+    check = X[:10_000]
+    fused = screener.screen(check)
+    # timed like the artifacts: loaded once, without the registry's per-call version check
+    model = screener.model()
+    for name in SPECS:
+        expected = sklearn_models[name].predict(check[:, columns[name]])
+        mismatches = np.count_nonzero(fused[name][0] != expected)
+        print(f"{name}: {mismatches} label mismatches against sklearn on {len(check)} records")
+
+    def sequential(models, batch):
+        return {name: models[name].predict(batch[:, columns[name]]) for name in SPECS}
+
+    print(f"\n{'rows':>9}{'fused ms':>11}{'sklearn ms':>12}{'artifacts ms':>14}{'vs sklearn':>12}{'vs artifacts':>14}")
+    size = 1
+    while size <= args.max_rows:
+        batch = X[:size]
+        fused = best_time(lambda: model.predict(batch))
+        sklearn_seconds = best_time(lambda: sequential(sklearn_models, batch))
+        artifact_seconds = best_time(lambda: sequential(artifacts, batch))
+        print(f"{size:>9}{fused * 1e3:>11.3f}{sklearn_seconds * 1e3:>12.3f}{artifact_seconds * 1e3:>14.3f}"
+              f"{sklearn_seconds / fused:>11.1f}x{artifact_seconds / fused:>13.1f}x")
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Cold-start cost of app.py, with an import-time report and a time budget.
+
+Two measurements, each in fresh interpreters (best of ``--runs``):
+
+``imports``       importing the modules app.py imports at the top level, taken
+                  from its source, i.e. what a new replica pays before the
+                  script can run;
+``first render``  the first AppTest run of the Home page, in a process that has
+                  only imported streamlit's test harness.
+
+The report lists the slowest top-level imports from ``python -X importtime``
+and checks that none of ``HEAVY_MODULES`` is imported at startup (those are
+for the pages that need them). The script exits with status 1 when a budget is
+exceeded or a heavy module is imported.
+
+Usage:
+    python benchmarks/bench_startup.py --report benchmarks/startup_report.txt
+    python benchmarks/bench_startup.py --rev HEAD~1     # app.py as of another revision
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+import textwrap
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['matplotlib', 'sklearn', 'scipy']
+
+
+def app_imports(source):
+    """The import statements at the top level of app.py's source."""
+    tree = ast.parse(source)
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def run_python(code, *flags):
+    result = subprocess.run([sys.executable, *flags, '-c', code], cwd=repo_dir, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=repo_dir))
+    if result.returncode:
+        raise RuntimeError(result.stderr)
+    return result
+
+
+def time_imports(imports, runs):
+    code = f"import time\nstart = time.perf_counter()\n{imports}\nprint(time.perf_counter() - start)"
+    return min(float(run_python(code).stdout) for _ in range(runs))
+
+
+def time_first_render(app_path, runs):
+    code = textwrap.dedent(f"""
+        import time, warnings
+        from unittest import mock
+        warnings.filterwarnings('ignore')
+        from streamlit.testing.v1 import AppTest
+        with mock.patch('streamlit_option_menu.option_menu', return_value='Home'):
+            at = AppTest.from_file({app_path!r}, default_timeout=120)
+            start = time.perf_counter()
+            at.run()
+            elapsed = time.perf_counter() - start
+        assert not at.exception, at.exception
+        print(elapsed)
+    """)
+    return min(float(run_python(code).stdout) for _ in range(runs))
+
+
+def import_profile(imports):
+    """[(cumulative us, top-level module)] from ``-X importtime``, slowest first,
+    and the set of every module imported."""
+    stderr = run_python(imports, '-X', 'importtime').stderr
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((int(cumulative), len(name) - len(name.lstrip(' ')), name.strip()))
+    top = min(depth for _, depth, _ in entries)
+    modules = {name for _, _, name in entries}
+    return sorted(((us, name) for us, depth, name in entries if depth == top), reverse=True), modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--rev', help='git revision to take app.py from (default: working tree)')
+    parser.add_argument('--import-budget-ms', type=float, default=2000.0)
+    parser.add_argument('--render-budget-ms', type=float, default=500.0)
+    parser.add_argument('--top', type=int, default=20, help='slowest imports to list')
+    parser.add_argument('--report', help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    app_path = os.path.join(repo_dir, 'app.py')
+    if args.rev:
+        source = subprocess.run(['git', 'show', f'{args.rev}:app.py'], cwd=repo_dir,
+                                check=True, capture_output=True, text=True).stdout
+    else:
+        with open(app_path, encoding='utf-8') as f:
+            source = f.read()
+    imports = app_imports(source)
+
+    imports_ms = time_imports(imports, args.runs) * 1e3
+    tmp = None
+    try:
+        if args.rev:
+            # next to the real app.py, so relative paths such as saved_models/ resolve
+            tmp = os.path.join(repo_dir, '.bench_startup_app.py')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(source)
+        render_ms = time_first_render(tmp or app_path, args.runs) * 1e3
+    finally:
+        if tmp:
+            os.remove(tmp)
+    profile, modules = import_profile(imports)
+    heavy = [m for m in HEAVY_MODULES if m in modules]
+
+    lines = [f"app.py{' at ' + args.rev if args.rev else ''} cold start (best of {args.runs}, "
+             f"Python {sys.version.split()[0]})",
+             f"  imports        {imports_ms:8.0f} ms   budget {args.import_budget_ms:.0f} ms",
+             f"  first render   {render_ms:8.0f} ms   budget {args.render_budget_ms:.0f} ms",
+             f"  heavy modules imported at startup: {', '.join(heavy) or 'none'}",
+             '',
+             "slowest top-level imports (-X importtime, cumulative):"]
+    lines += [f"  {us / 1e3:8.1f} ms  {name}" for us, name in profile[:args.top]]
+    report = '\n'.join(lines) + '\n'
+    print(report, end='')
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(report)
+
+    failures = []
+    if imports_ms > args.import_budget_ms:
+        failures.append(f"imports took {imports_ms:.0f} ms, over the {args.import_budget_ms:.0f} ms budget")
+    if render_ms > args.render_budget_ms:
+        failures.append(f"first render took {render_ms:.0f} ms, over the {args.render_budget_ms:.0f} ms budget")
+    if heavy:
+        failures.append(f"{', '.join(heavy)} imported at startup")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Accuracy and memory of out-of-core training against the in-memory fit.
+
+For each model the dataset is split 80/20 exactly as the notebooks do. The
+training rows are fitted once in memory with the notebook's estimator and
+once by train_stream.py from a temporary CSV read in small chunks, and both
+are scored on the same test rows. Peak Python heap (tracemalloc) is reported
+for each fit; with ``--replicate N`` the training CSV holds N noisy copies of
+the training rows, which shows the streaming trainer's memory staying flat.
+
+Usage:
+    python benchmarks/bench_stream_training.py [--chunk-size 64] [--epochs 20]
+    python benchmarks/bench_stream_training.py --model heart --replicate 1000 --chunk-size 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from sklearn import svm  # noqa: E402
+from sklearn.linear_model import LogisticRegression  # noqa: E402
+from sklearn.metrics import accuracy_score  # noqa: E402
+
+from linear_model import LinearPredictor  # noqa: E402
+from specs import SPECS, get_spec  # noqa: E402
+from train import hold_out, load_training_data  # noqa: E402
+from train_stream import train_stream  # noqa: E402
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def write_training_csv(path, X_train, Y_train, label, replicate):
+    rng = np.random.default_rng(0)
+    df = X_train.assign(**{label: Y_train.to_numpy()})
+    df.to_csv(path, index=False)
+    scale = X_train.std().to_numpy() * 0.01
+    for _ in range(replicate - 1):
+        noisy = df.copy()
+        noisy[X_train.columns] += rng.normal(size=X_train.shape) * scale
+        noisy.to_csv(path, mode='a', header=False, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append')
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--alpha', type=float, default=1e-2)
+    parser.add_argument('--replicate', type=int, default=1, help='copies of the training rows in the CSV')
+    args = parser.parse_args(argv)
+
+    print(f"{'model':<11}{'fit':<10}{'test acc':>9}{'seconds':>9}{'peak MB':>9}")
+    for name in args.model or sorted(SPECS):
+        spec = get_spec(name)
+        X, Y = load_training_data(name)
+        X_train, X_test, Y_train, Y_test = hold_out(name, X, Y)
+        estimator = LogisticRegression(max_iter=5000) if name == 'heart' else svm.SVC(kernel='linear')
+        model, seconds, peak = measure(lambda: estimator.fit(X_train, Y_train))
+        accuracy = accuracy_score(Y_test, model.predict(X_test))
+        print(f"{name:<11}{'memory':<10}{accuracy:>9.3f}{seconds:>9.2f}{peak / 2**20:>9.1f}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'train.csv')
+            write_training_csv(path, X_train, Y_train, spec.label, args.replicate)
+            # hold nothing out: the test rows are already outside the CSV
+            (trainer, _), seconds, peak = measure(lambda: train_stream(
+                name, path, args.chunk_size, args.epochs, args.alpha, holdout=0.0, checkpoint_dir=tmp))
+        predictor = LinearPredictor.from_estimator(trainer.pipeline())
+        accuracy = accuracy_score(Y_test, predictor.predict(X_test.to_numpy(dtype=np.float64)))
+        print(f"{'':<11}{'streaming':<10}{accuracy:>9.3f}{seconds:>9.2f}{peak / 2**20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Load generator for prediction_service.py.
+
+Opens ``--concurrency`` keep-alive connections, each sending rows sampled from
+the model's dataset/ CSV as fast as the service answers, and reports
+throughput and client-side latency percentiles.
+
+Usage:
+    python prediction_service.py --port 8000 &
+    python benchmarks/load_generator.py --model heart --concurrency 64 --seconds 10
+    python benchmarks/load_generator.py --model heart --rows-per-request 100   # use "instances"
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_cache import load_dataset  # noqa: E402
+from specs import SPECS  # noqa: E402
+
+
+def make_bodies(name, rows_per_request, count=1000, seed=0):
+    X = load_dataset(name).X()
+    rng = np.random.default_rng(seed)
+    bodies = []
+    for _ in range(count):
+        rows = X[rng.integers(0, len(X), rows_per_request)].tolist()
+        payload = {'features': rows[0]} if rows_per_request == 1 else {'instances': rows}
+        bodies.append(json.dumps(payload).encode())
+    return bodies
+
+
+def worker(host, port, path, bodies, stop_at, latencies, errors):
+    conn = http.client.HTTPConnection(host, port)
+    headers = {'Content-Type': 'application/json'}
+    i = 0
+    while time.monotonic() < stop_at:
+        body = bodies[i % len(bodies)]
+        i += 1
+        start = time.perf_counter()
+        conn.request('POST', path, body, headers)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            errors.append(response.status)
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', choices=sorted(SPECS), default='heart')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--rows-per-request', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    bodies = make_bodies(args.model, args.rows_per_request)
+    stop_at = time.monotonic() + args.seconds
+    per_thread = [([], []) for _ in range(args.concurrency)]
+    threads = [threading.Thread(target=worker, args=(args.host, args.port, f'/predict/{args.model}',
+                                                     bodies, stop_at, latencies, errors))
+               for latencies, errors in per_thread]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([x for lat, _ in per_thread for x in lat])
+    n_errors = sum(len(err) for _, err in per_thread)
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3 if len(latencies) else (0.0, 0.0)
+    print(f"{len(latencies)} requests ({len(latencies) * args.rows_per_request} rows) in {elapsed:.1f}s, "
+          f"{n_errors} errors")
+    print(f"{len(latencies) / elapsed:,.0f} requests/s, {len(latencies) * args.rows_per_request / elapsed:,.0f} rows/s, "
+          f"p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+    conn = http.client.HTTPConnection(args.host, args.port)
+    conn.request('GET', '/metrics')
+    print('server:', json.dumps(json.loads(conn.getresponse().read())[args.model]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Benchmark suite with a stored baseline, for gating dependency upgrades.
+
+Three groups of measurements:
+
+``predict``  single-row predict latency of each model, both through the
+             pickled scikit-learn estimator (``model.predict([row])``, as the
+             app originally did) and through the served artifact
+             (``predict_one`` on the model the app's registry loads);
+``rerun``    wall time of a full Streamlit rerun of app.py per page, driven
+             through AppTest (see bench_rerun.py);
+``batch``    rows/s of ``predict`` on batches of 1 to ``--max-rows`` rows,
+             sampled column by column from the dataset/ distributions, for
+             both the estimator and the artifact.
+
+Results are written as JSON (``--output``) with the library versions they
+were measured with. With ``--baseline`` every metric is compared with the
+stored one and the script exits with status 1 when any metric regressed by
+more than its group's threshold. To tell a regression from noise, the
+CPU-bound groups (``predict`` and ``batch``) are compared after scaling by a
+calibration loop timed in both runs, and groups with regressions are
+re-measured (``--retries``) before failing. ``rerun`` is compared unscaled:
+a Streamlit rerun is dominated by the script runner's threads and I/O, and
+does not follow the calibration loop's speed. Baselines
+are still best compared on the same machine: record one before changing
+requirements.txt, then run the suite again against it after the upgrade.
+
+Usage:
+    python benchmarks/run_benchmarks.py --save-baseline            # writes benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --output results.json
+    python benchmarks/run_benchmarks.py --only predict,batch --max-rows 100000
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+from dataset_cache import load_dataset  # noqa: E402
+from model_artifact import load_model, resolve_model_path  # noqa: E402
+from model_registry import load_pickle  # noqa: E402
+from specs import SPECS, model_path  # noqa: E402
+
+GROUPS = ['predict', 'rerun', 'batch']
+# allowed relative slowdown per group before a metric counts as a regression;
+# microsecond-scale timings vary by tens of percent between runs on a shared machine
+THRESHOLDS = {'predict': 0.5, 'rerun': 0.3, 'batch': 0.5}
+# groups whose timings scale with the calibration loop
+CALIBRATED = {'predict', 'batch'}
+DEFAULT_BASELINE = os.path.join(repo_dir, 'benchmarks', 'baseline.json')
+
+
+def synthetic_rows(name, n, seed=0):
+    """``n`` rows whose columns are drawn independently from the dataset's columns."""
+    dataset = load_dataset(name)
+    rng = np.random.default_rng(seed)
+    return np.stack([dataset[feature][rng.integers(0, len(dataset), n)] for feature in dataset.features],
+                    axis=1).astype(np.float64)
+
+
+def load_backends(name):
+    return {'sklearn': load_pickle(model_path(name)), 'artifact': load_model(resolve_model_path(name))}
+
+
+def metric(value, unit, better, gate=True):
+    """``gate=False`` marks metrics that are reported but too noisy to fail a
+    comparison on (single samples and tail latencies)."""
+    return {'value': value, 'unit': unit, 'better': better, 'gate': gate}
+
+
+def bench_predict(names, runs):
+    results = {}
+    for name in names:
+        rows = synthetic_rows(name, runs).tolist()
+        for backend, model in load_backends(name).items():
+            call = (lambda row: model.predict([row])) if backend == 'sklearn' else model.predict_one
+            call(rows[0])
+            timings = []
+            for row in rows:
+                start = time.perf_counter()
+                call(row)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            results[f'{name}/{backend}/median_us'] = metric(statistics.median(timings) * 1e6, 'us', 'lower')
+            results[f'{name}/{backend}/p95_us'] = metric(timings[int(0.95 * len(timings))] * 1e6, 'us', 'lower',
+                                                           gate=False)
+    return results
+
+
+def bench_rerun_pages(runs):
+    from bench_rerun import bench
+
+    results = {}
+    for page, (first, median) in bench(os.path.join(repo_dir, 'app.py'), runs).items():
+        results[f'{page}/first_ms'] = metric(first * 1e3, 'ms', 'lower', gate=False)
+        results[f'{page}/median_ms'] = metric(median * 1e3, 'ms', 'lower')
+    return results
+
+
+def bench_batch(names, max_rows, windows=10, window_seconds=0.02):
+    sizes = [10 ** k for k in range(int(np.log10(max_rows)) + 1)]
+    results = {}
+    for name in names:
+        X = synthetic_rows(name, sizes[-1])
+        for backend, model in load_backends(name).items():
+            for size in sizes:
+                batch = X[:size]
+                model.predict(batch)
+                # best of several short windows: robust to other load on the machine
+                best = 0.0
+                for _ in range(windows):
+                    repeats, start = 0, time.perf_counter()
+                    while True:
+                        model.predict(batch)
+                        repeats += 1
+                        elapsed = time.perf_counter() - start
+                        if elapsed >= window_seconds:
+                            break
+                    best = max(best, size * repeats / elapsed)
+                results[f'{name}/{backend}/{size}_rows_per_s'] = metric(best, 'rows/s', 'higher')
+    return results
+
+
+def calibrate(repeats=5):
+    """Best-of time of a fixed Python + NumPy workload, the machine's speed
+    unit: comparisons scale the baseline by the ratio of the two calibrations."""
+    rng = np.random.default_rng(0)
+    X, w = rng.normal(size=(1000, 8)), rng.normal(size=8)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        total = 0.0
+        for i in range(20_000):
+            total += i * 0.5
+        for _ in range(200):
+            np.count_nonzero(X @ w > 0)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def environment():
+    import sklearn
+    import streamlit
+
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir,
+                                  check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scikit-learn': sklearn.__version__,
+        'streamlit': streamlit.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'revision': revision,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_groups(groups, names, args):
+    results = {}
+    if 'predict' in groups:
+        results['predict'] = bench_predict(names, args.predict_runs)
+    if 'rerun' in groups:
+        results['rerun'] = bench_rerun_pages(args.rerun_runs)
+    if 'batch' in groups:
+        results['batch'] = bench_batch(names, args.max_rows)
+    return results
+
+
+def merge_best(metrics, retry):
+    """Keep the better value of two measurements of the same metrics."""
+    for key, m in retry.items():
+        old = metrics[key]['value']
+        metrics[key]['value'] = min(old, m['value']) if m['better'] == 'lower' else max(old, m['value'])
+
+
+def compare(results, baseline, thresholds):
+    """Return (rows, regressions): one row per metric present in both runs.
+
+    Slowdowns of the CALIBRATED groups are relative to the baseline scaled by
+    the ratio of the two runs' calibration times, so a uniformly slower
+    machine is not a regression; the other groups are compared as measured.
+    """
+    calibrated_speed = (results['calibration_s'] / baseline['calibration_s']
+                        if baseline.get('calibration_s') else 1.0)
+    rows, regressions = [], []
+    for group, metrics in results['groups'].items():
+        speed = calibrated_speed if group in CALIBRATED else 1.0
+        for key, current in metrics.items():
+            previous = baseline.get('groups', {}).get(group, {}).get(key)
+            if previous is None:
+                continue
+            expected = previous['value'] * speed if current['better'] == 'lower' else previous['value'] / speed
+            ratio = current['value'] / expected if expected else float('inf')
+            slowdown = ratio - 1 if current['better'] == 'lower' else 1 / ratio - 1
+            row = (group, key, previous['value'], current['value'], slowdown)
+            rows.append(row)
+            if current.get('gate', True) and slowdown > thresholds[group]:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--only', default=','.join(GROUPS), help=f"comma-separated groups ({','.join(GROUPS)})")
+    parser.add_argument('--model', choices=sorted(SPECS), action='append')
+    parser.add_argument('--predict-runs', type=int, default=2000)
+    parser.add_argument('--rerun-runs', type=int, default=10)
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--baseline', help='compare with this results JSON')
+    parser.add_argument('--save-baseline', action='store_true', help=f'write the results to {DEFAULT_BASELINE}')
+    parser.add_argument('--threshold', type=float, help='allowed relative slowdown for every group')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='re-measure groups with regressions this many times before failing')
+    args = parser.parse_args(argv)
+    warnings.filterwarnings('ignore')
+
+    groups = args.only.split(',')
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups {sorted(unknown)}")
+    names = args.model or sorted(SPECS)
+
+    start_calibration = calibrate()
+    results = {'environment': environment(), 'groups': run_groups(groups, names, args)}
+    # the mean of both ends, as the machine's speed can drift during a run
+    results['calibration_s'] = (start_calibration + calibrate()) / 2
+
+    for group, metrics in results['groups'].items():
+        for key, m in metrics.items():
+            print(f"{group:<8}{key:<50}{m['value']:>14.1f} {m['unit']}")
+
+    for path in filter(None, [args.output, DEFAULT_BASELINE if args.save_baseline else None]):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        thresholds = {group: args.threshold if args.threshold is not None else limit
+                      for group, limit in THRESHOLDS.items()}
+        rows, regressions = compare(results, baseline, thresholds)
+        for _ in range(args.retries):
+            if not regressions:
+                break
+            # a real regression survives re-measurement, a noisy sample does not
+            retry = run_groups({group for group, *_ in regressions}, names, args)
+            for group, metrics in retry.items():
+                merge_best(results['groups'][group], metrics)
+            rows, regressions = compare(results, baseline, thresholds)
+        env = baseline.get('environment', {})
+        print(f"\nbaseline: numpy {env.get('numpy')}, scikit-learn {env.get('scikit-learn')}, "
+              f"streamlit {env.get('streamlit')} at {env.get('revision')}")
+        for row in rows:
+            group, key, previous, current, slowdown = row
+            flag = '  REGRESSION' if row in regressions else ''
+            print(f"{group:<8}{key:<50}{previous:>14.1f}{current:>14.1f}{slowdown:>+8.0%}{flag}")
+        if regressions:
+            print(f"{len(regressions)} of {len(rows)} metrics regressed beyond their threshold")
+            sys.exit(1)
+        print(f"no regressions in {len(rows)} metrics")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""Typed, memory-mapped columnar cache of the bundled dataset CSVs.
+
+Each CSV is parsed once into a directory of one ``.npy`` file per column
+under ``<csv directory>/cache/<stem>/``, e.g. ``dataset/cache/heart/``::
+
+    <column>.npy    int64, float64 or fixed-width unicode, in CSV row order
+    manifest.json   the schema (every column's name, dtype and role: feature,
+                    label or extra), the feature order the model expects, the
+                    label column, and the size, mtime and sha256 of the CSV
+
+Columns are opened with ``np.load(mmap_mode='r')``: loading is a stat of the
+CSV plus one small JSON read and a header read per column, whatever the row
+count, and the arrays are shared read-only views of the page cache. The cache
+is rebuilt when the CSV changes (size/mtime first, sha256 to confirm, like the
+model registry), and the manifest is written last, so a half-written cache is
+never picked up.
+
+Usage:
+    python dataset_cache.py build          # (re)build all three caches
+    python dataset_cache.py info --model heart
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from model_registry import file_digest
+from specs import SPECS, dataset_path, get_spec
+
+SCHEMA_VERSION = 1
+MANIFEST = 'manifest.json'
+
+
+class DatasetError(ValueError):
+    pass
+
+
+def cache_dir(source):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(source)), 'cache', stem)
+
+
+def _column_file(column):
+    # feature names such as 'MDVP:Fo(Hz)' are not portable file names
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in column) + '.npy'
+
+
+def build(name, source=None):
+    """Parse the CSV of ``name`` into its cache directory; returns the manifest."""
+    import pandas as pd
+
+    spec = get_spec(name)
+    source = source or dataset_path(name)
+    stat = os.stat(source)
+    df = pd.read_csv(source, encoding='utf-8-sig')
+    missing = [c for c in spec.features + [spec.label] if c not in df.columns]
+    if missing:
+        raise DatasetError(f"{source} is missing the columns {missing}")
+    if not pd.api.types.is_integer_dtype(df[spec.label]):
+        raise DatasetError(f"{source}: label column {spec.label!r} is {df[spec.label].dtype}, expected integers")
+
+    path = cache_dir(source)
+    os.makedirs(path, exist_ok=True)
+    schema, files = [], {}
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype == object:
+            values = values.astype(str)
+        role = 'label' if column == spec.label else 'feature' if column in spec.features else 'extra'
+        files[column] = _column_file(column)
+        tmp = os.path.join(path, files[column] + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp, os.path.join(path, files[column]))
+        schema.append({'name': column, 'dtype': values.dtype.str, 'role': role, 'file': files[column]})
+
+    manifest = {
+        'schema_version': SCHEMA_VERSION,
+        'model': name,
+        'rows': len(df),
+        'columns': schema,
+        'features': list(spec.features),
+        'label': spec.label,
+        'source': {'file': os.path.basename(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                   'sha256': file_digest(source)},
+    }
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def _write_manifest(path, manifest):
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('schema_version') == SCHEMA_VERSION else None
+
+
+def _current_manifest(name, source):
+    """The cache manifest for ``source``, rebuilding the cache if it is stale."""
+    path = cache_dir(source)
+    manifest = _read_manifest(path)
+    stat = os.stat(source)
+    if manifest is not None and manifest['model'] == name:
+        recorded = manifest['source']
+        if recorded['size'] == stat.st_size and recorded['mtime_ns'] == stat.st_mtime_ns:
+            return manifest
+        if recorded['size'] == stat.st_size and recorded['sha256'] == file_digest(source):
+            # touched but not modified
+            recorded['mtime_ns'] = stat.st_mtime_ns
+            _write_manifest(path, manifest)
+            return manifest
+    return build(name, source)
+
+
+class Dataset:
+    """Read-only, memory-mapped columns of one dataset.
+
+    ``columns`` maps every CSV column name to its array; ``features`` and
+    ``label`` are the model's feature order and label column.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.features = manifest['features']
+        self.label = manifest['label']
+        self.digest = manifest['source']['sha256']
+        self.columns = {c['name']: np.load(os.path.join(path, c['file']), mmap_mode='r')
+                        for c in manifest['columns']}
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def X(self, dtype=np.float64):
+        """Feature matrix in model order (a copy: the columns are stored apart)."""
+        X = np.empty((len(self), len(self.features)), dtype=dtype)
+        for j, feature in enumerate(self.features):
+            X[:, j] = self.columns[feature]
+        return X
+
+    @property
+    def y(self):
+        return self.columns[self.label]
+
+    def frame(self, columns=None):
+        """pandas DataFrame of ``columns`` (default: features then label)."""
+        import pandas as pd
+
+        columns = columns or self.features + [self.label]
+        return pd.DataFrame({c: self.columns[c] for c in columns}, copy=False)
+
+
+def dataset_version(name, source=None):
+    """sha256 of the CSV behind the cache, without mapping any column; cheap
+    enough to call on every rerun as a cache key."""
+    return _current_manifest(name, source or dataset_path(name))['source']['sha256']
+
+
+def load_dataset(name, source=None):
+    """Memory-map the cached columns of ``name``'s CSV (``source`` defaults to
+    the bundled dataset/ file), building the cache first if needed."""
+    source = source or dataset_path(name)
+    return Dataset(cache_dir(source), _current_manifest(name, source))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append',
+                        help='dataset to process (default: all three)')
+    args = parser.parse_args(argv)
+
+    for name in args.model or sorted(SPECS):
+        if args.command == 'build':
+            start = time.perf_counter()
+            manifest = build(name)
+            print(f"{name}: {manifest['rows']} rows, {len(manifest['columns'])} columns "
+                  f"in {(time.perf_counter() - start) * 1e3:.1f} ms -> {cache_dir(dataset_path(name))}")
+        else:
+            start = time.perf_counter()
+            dataset = load_dataset(name)
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {len(dataset)} rows, label {dataset.label!r}, loaded in {elapsed * 1e3:.2f} ms")
+            for column in dataset.manifest['columns']:
+                print(f"  {column['name']:<20}{column['dtype']:<8}{column['role']}")
+
+
+if __name__ == '__main__':
+    main()
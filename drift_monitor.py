@@ -0,0 +1,266 @@
+"""Input-drift monitoring of the live model inputs against dataset/.
+
+Every feature of every model has a reference sketch: fixed bin edges at the
+deciles of the dataset column, plus a bin of its own for any value that holds
+at least a decile of the column (the zero ``Insulin``/``SkinThickness``
+placeholders of diabetes.csv, the 0/1 ``sex`` of heart.csv), and the share of
+the dataset in every bin. Sketches are stored as ``drift_reference.json`` in
+the dataset cache directory and rebuilt when the CSV changes.
+
+Live inputs are counted into the same bins. ``observe`` only copies the row
+into a fixed buffer; a full buffer is binned in one vectorized step and added
+to the live counts, which decay with a half-life of ``half_life``
+observations so that the scores follow recent traffic. Including its share
+of the binning, an observation costs about 2us (``python drift_monitor.py``
+prints the figure). Memory
+is fixed: one buffer and one counts matrix per model.
+
+Scores, per feature, of the live bin shares p against the reference shares q:
+
+    psi = sum (p - q) * ln(p / q)        > 0.1 moderate, > 0.25 significant drift
+    ks  = max |cumsum(p) - cumsum(q)|    Kolmogorov-Smirnov distance on the bins
+
+The app exports them as Prometheus gauges with its stage timings (see
+stage_timings.py; on when HEALTH_APP_METRICS_PORT or _LOG is set) and the
+prediction service adds them to GET /metrics.
+
+Usage:
+    python drift_monitor.py --model diabetes       # replay the dataset, then a shifted copy
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from dataset_cache import cache_dir, load_dataset
+from specs import SPECS, dataset_path
+from stage_timings import log_to_stderr
+
+log = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+REFERENCE_FILE = 'drift_reference.json'
+BINS = 10
+# share added to every bin, so that empty bins keep the logarithm finite
+EPSILON = 1e-4
+PSI_WARNING = 0.25
+
+
+class ReferenceSketch:
+    """Bin edges and reference bin shares of every feature of one model.
+
+    ``edges`` is (n_features, n_edges), padded with +inf; a value falls in bin
+    ``(value >= edges).sum()``, so there are n_edges + 1 bins per feature.
+    """
+
+    def __init__(self, features, edges, shares, digest=None):
+        self.features = list(features)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.shares = np.asarray(shares, dtype=np.float64)
+        self.digest = digest
+
+    @property
+    def n_bins(self):
+        return self.edges.shape[1] + 1
+
+    @classmethod
+    def from_data(cls, X, features, digest=None, bins=BINS):
+        X = np.asarray(X, dtype=np.float64)
+        columns = []
+        for column in X.T:
+            values, counts = np.unique(column, return_counts=True)
+            masses = values[counts >= len(column) / bins]
+            quantiles = np.quantile(column, np.linspace(0, 1, bins + 1)[1:-1])
+            columns.append(np.unique(np.concatenate([quantiles, masses, np.nextafter(masses, np.inf)])))
+        edges = np.full((len(columns), max(map(len, columns))), np.inf)
+        for j, column in enumerate(columns):
+            edges[j, :len(column)] = column
+        sketch = cls(features, edges, np.zeros((len(columns), edges.shape[1] + 1)), digest)
+        sketch.shares = sketch.count(X) / len(X)
+        return sketch
+
+    def count(self, X):
+        """(n_features, n_bins) bin counts of the rows of ``X``."""
+        bins = (X[:, :, None] >= self.edges).sum(axis=2)
+        bins += np.arange(len(self.features)) * self.n_bins
+        counts = np.bincount(bins.ravel(), minlength=len(self.features) * self.n_bins)
+        return counts.reshape(len(self.features), self.n_bins).astype(np.float64)
+
+    def to_json(self):
+        return {'schema_version': SCHEMA_VERSION, 'features': self.features, 'digest': self.digest,
+                'edges': [[e for e in row if e != math.inf] for row in self.edges.tolist()],
+                'shares': self.shares.tolist()}
+
+    @classmethod
+    def from_json(cls, payload):
+        width = max(map(len, payload['edges']))
+        edges = np.full((len(payload['edges']), width), np.inf)
+        for j, row in enumerate(payload['edges']):
+            edges[j, :len(row)] = row
+        return cls(payload['features'], edges, payload['shares'], payload['digest'])
+
+
+def reference_sketch(name, source=None):
+    """The reference sketch of ``name``'s dataset CSV, rebuilt and stored in
+    the dataset cache when missing or older than the CSV."""
+    source = source or dataset_path(name)
+    dataset = load_dataset(name, source)
+    path = os.path.join(cache_dir(source), REFERENCE_FILE)
+    try:
+        with open(path) as f:
+            payload = json.load(f)
+        if payload.get('schema_version') == SCHEMA_VERSION and payload['digest'] == dataset.digest:
+            return ReferenceSketch.from_json(payload)
+    except (OSError, ValueError):
+        pass
+    sketch = ReferenceSketch.from_data(dataset.X(), dataset.features, dataset.digest)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(sketch.to_json(), f)
+    os.replace(tmp, path)
+    return sketch
+
+
+def drift_scores(counts, shares):
+    """(psi, ks) per feature of live ``counts`` against reference ``shares``."""
+    p = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1e-300) + EPSILON
+    q = shares + EPSILON
+    p /= p.sum(axis=1, keepdims=True)
+    q /= q.sum(axis=1, keepdims=True)
+    psi = ((p - q) * np.log(p / q)).sum(axis=1)
+    ks = np.abs(np.cumsum(p, axis=1) - np.cumsum(q, axis=1)).max(axis=1)
+    return psi, ks
+
+
+class _Live:
+    __slots__ = ('reference', 'buffer', 'pos', 'counts', 'observations', 'lock')
+
+    def __init__(self, reference, buffer_size):
+        self.reference = reference
+        self.buffer = np.empty((buffer_size, len(reference.features)))
+        self.pos = 0
+        self.counts = np.zeros((len(reference.features), reference.n_bins))
+        self.observations = 0
+        self.lock = threading.Lock()
+
+    def fold(self, half_life):
+        # caller holds the lock
+        if self.pos:
+            self.counts *= 0.5 ** (self.pos / half_life)
+            self.counts += self.reference.count(self.buffer[:self.pos])
+            self.observations += self.pos
+            self.pos = 0
+
+
+class DriftMonitor:
+    """Live bin counts of the inputs of the models in ``references`` (model
+    name -> ReferenceSketch). Disabled, ``observe`` returns at once."""
+
+    def __init__(self, references, enabled=True, buffer_size=1024, half_life=10_000):
+        self.enabled = enabled
+        self.half_life = half_life
+        self._live = {name: _Live(reference, buffer_size) for name, reference in references.items()}
+
+    @classmethod
+    def from_datasets(cls, names=None, **options):
+        return cls({name: reference_sketch(name) for name in names or SPECS}, **options)
+
+    def observe(self, name, row):
+        """Count one input row (in the model's feature order)."""
+        if not self.enabled:
+            return
+        live = self._live[name]
+        with live.lock:
+            live.buffer[live.pos] = row
+            live.pos += 1
+            if live.pos == len(live.buffer):
+                live.fold(self.half_life)
+
+    def observe_many(self, name, rows):
+        for row in rows:
+            self.observe(name, row)
+
+    def scores(self):
+        """{model: {'observations': n, 'features': {feature: {'psi', 'ks'}}}}
+        for the models that have seen any input."""
+        result = {}
+        for name, live in self._live.items():
+            with live.lock:
+                live.fold(self.half_life)
+                counts, observations = live.counts.copy(), live.observations
+            if not observations:
+                continue
+            psi, ks = drift_scores(counts, live.reference.shares)
+            result[name] = {'observations': observations,
+                            'features': {f: {'psi': float(psi[j]), 'ks': float(ks[j])}
+                                         for j, f in enumerate(live.reference.features)}}
+        return result
+
+    def render_prometheus(self):
+        scores = self.scores()
+        lines = ['# HELP health_app_input_observations_total Inputs seen by the drift monitor.',
+                 '# TYPE health_app_input_observations_total counter']
+        lines += [f'health_app_input_observations_total{{model="{name}"}} {s["observations"]}'
+                  for name, s in scores.items()]
+        for metric, help_text in (('psi', 'Population stability index of recent inputs against dataset/.'),
+                                  ('ks', 'Kolmogorov-Smirnov distance of recent inputs from dataset/ (binned).')):
+            lines += [f'# HELP health_app_input_drift_{metric} {help_text}',
+                      f'# TYPE health_app_input_drift_{metric} gauge']
+            lines += [f'health_app_input_drift_{metric}{{model="{name}",feature="{feature}"}} {values[metric]!r}'
+                      for name, s in scores.items() for feature, values in s['features'].items()]
+        return '\n'.join(lines) + '\n'
+
+    def log_summary(self):
+        for name, s in self.scores().items():
+            worst = max(s['features'].items(), key=lambda item: item[1]['psi'])
+            level = logging.WARNING if worst[1]['psi'] > PSI_WARNING else logging.INFO
+            log.log(level, "%s inputs: n=%d, highest psi %.3f (%s, ks %.3f)", name, s['observations'],
+                    worst[1]['psi'], worst[0], worst[1]['ks'])
+
+
+def from_timings(timings):
+    """DriftMonitor enabled together with the StageTimings ``timings``, and
+    exported with them (Prometheus endpoint and/or periodic log)."""
+    if not timings.enabled:
+        return DriftMonitor({}, enabled=False)
+    monitor = DriftMonitor.from_datasets()
+    timings.add_collector(monitor)
+    if timings.log_interval:
+        log_to_stderr(log)
+    return monitor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', choices=sorted(SPECS), default='diabetes')
+    parser.add_argument('--shift', type=float, default=0.5,
+                        help='shift of the replayed copy, in standard deviations of each feature')
+    args = parser.parse_args(argv)
+
+    monitor = DriftMonitor.from_datasets([args.model], half_life=500)
+    X = load_dataset(args.model).X()
+    rows = X.tolist()
+    start = time.perf_counter()
+    monitor.observe_many(args.model, rows)
+    per_row = (time.perf_counter() - start) / len(rows)
+
+    def report(title):
+        features = monitor.scores()[args.model]['features']
+        print(title)
+        for feature, s in features.items():
+            print(f"  {feature:<26} psi {s['psi']:7.3f}   ks {s['ks']:.3f}")
+
+    report(f"{args.model}: dataset replayed ({len(rows)} rows, {per_row * 1e6:.2f} us per observe)")
+    shifted = X + args.shift * X.std(axis=0)
+    for _ in range(5):
+        monitor.observe_many(args.model, shifted.tolist())
+    report(f"after 5 replays shifted by {args.shift} standard deviations")
+
+
+if __name__ == '__main__':
+    main()
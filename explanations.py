@@ -0,0 +1,111 @@
+"""Exact per-feature contributions of the linear models' decisions.
+
+The decision score of every served model is ``z @ w + b``, where ``z`` is the
+input row (rarity-weighted first for models trained that way). Relative to the
+average patient of the model's dataset, ``zbar``, it splits exactly into
+
+    score = (b + zbar @ w) + sum_j w_j * (z_j - zbar_j)
+
+so ``w_j * (z_j - zbar_j)`` is how much feature j moved this patient's score
+away from the average one; positive values push towards the positive class.
+For a batch this is one broadcast multiply, plus an ``argpartition`` for the
+top-k drivers: about a microsecond per row batched and 15-25us for a single
+row, against the milliseconds of SHAP or permutation importance.
+
+Usage:
+    python explanations.py --model heart --rows 5      # drivers of the first dataset rows
+"""
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+Driver = namedtuple('Driver', ['feature', 'value', 'contribution'])
+
+
+class Explainer:
+    """Contributions of a linear_model.LinearPredictor relative to ``baseline``
+    (the mean model input, after any rarity weighting)."""
+
+    def __init__(self, predictor, baseline, features):
+        self.predictor = predictor
+        self.baseline = np.asarray(baseline, dtype=np.float64)
+        self.features = list(features)
+        self.coef = np.asarray(predictor.coef_, dtype=np.float64)
+        self.base_value = float(self.baseline @ self.coef) + predictor.intercept_
+
+    @classmethod
+    def from_dataset(cls, name, predictor):
+        """Baseline from the mean of the model's bundled dataset."""
+        from dataset_cache import load_dataset
+
+        dataset = load_dataset(name)
+        X = dataset.X()
+        if predictor.rarity is not None:
+            X = predictor.rarity.transform(X)
+        return cls(predictor, X.mean(axis=0), dataset.features)
+
+    def contributions(self, X):
+        """(n_rows, n_features) contributions; each row sums to score - base_value."""
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        if self.predictor.rarity is not None:
+            X = self.predictor.rarity.transform(X)
+        return (X - self.baseline) * self.coef
+
+    def top_k(self, X, k=3):
+        """Indices and contributions of the ``k`` largest |contributions| per
+        row, largest first; both (n_rows, k)."""
+        contributions = self.contributions(X)
+        k = min(k, contributions.shape[1])
+        magnitude = np.abs(contributions)
+        top = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(magnitude, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return top, np.take_along_axis(contributions, top, axis=1)
+
+    def explain_one(self, x, k=3):
+        """Top ``k`` drivers of one row as ``Driver(feature, value, contribution)``."""
+        # 1-D path: the batch machinery costs more than the arithmetic for one row
+        x = np.asarray(x, dtype=np.float64)
+        z = self.predictor.rarity.transform_one(x) if self.predictor.rarity is not None else x
+        contributions = (z - self.baseline) * self.coef
+        top = np.argsort(-np.abs(contributions))[:k]
+        return [Driver(self.features[j], float(x[j]), float(contributions[j])) for j in top]
+
+
+def main(argv=None):
+    import time
+
+    from dataset_cache import load_dataset
+    from model_artifact import load_model, resolve_model_path
+    from specs import SPECS
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', choices=sorted(SPECS), default='heart')
+    parser.add_argument('--rows', type=int, default=5)
+    parser.add_argument('-k', type=int, default=3, help='drivers per row')
+    args = parser.parse_args(argv)
+
+    predictor = load_model(resolve_model_path(args.model))
+    explainer = Explainer.from_dataset(args.model, predictor)
+    X = load_dataset(args.model).X()
+    scores = predictor.decision_function(X)
+    error = np.max(np.abs(explainer.contributions(X).sum(axis=1) + explainer.base_value - scores))
+    print(f"{args.model}: base score {explainer.base_value:+.3f}, max |sum of contributions - score| {error:.2g}")
+    for x, score in zip(X[:args.rows], scores):
+        drivers = ', '.join(f"{d.feature}={d.value:g} ({d.contribution:+.2f})" for d in explainer.explain_one(x, args.k))
+        print(f"  score {score:+.3f}: {drivers}")
+
+    batch = X[np.random.default_rng(0).integers(0, len(X), 100_000)]
+    start = time.perf_counter()
+    explainer.top_k(batch, args.k)
+    per_row = (time.perf_counter() - start) / len(batch)
+    start = time.perf_counter()
+    for x in batch[:2_000]:
+        explainer.explain_one(x, args.k)
+    per_single = (time.perf_counter() - start) / 2_000
+    print(f"top-{args.k}: {per_row * 1e6:.2f} us/row batched, {per_single * 1e6:.1f} us for a single row")
+
+
+if __name__ == '__main__':
+    main()
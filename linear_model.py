@@ -0,0 +1,126 @@
+"""Minimal NumPy inference for the saved linear models.
+
+All three models are linear: the diabetes and Parkinson's models are
+``svm.SVC(kernel='linear')`` and the heart model is ``LogisticRegression``. Their
+decision function is a single dot product, so for one row it is far cheaper to
+evaluate ``x @ w + b`` directly than to go through sklearn's input validation in
+``predict``.
+
+The weights are stored on disk by model_artifact.py.
+
+Usage:
+    python linear_model.py [--dtype float32]   # compare against sklearn on dataset/
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from model_registry import load_pickle
+from specs import SPECS, model_path
+
+
+class LinearPredictor:
+    """``sign(x @ coef + intercept)`` with the sklearn predict API.
+
+    ``predict``, ``decision_function`` and ``classes_`` behave like the
+    estimator the weights came from, so the predictor can be used wherever the
+    app or the batch scorer used the sklearn model. ``rarity`` (a
+    rarity.RarityWeights) is applied to the inputs first when the model was
+    trained on rarity-weighted features.
+    """
+
+    def __init__(self, coef, intercept, classes, rarity=None):
+        self.coef_ = np.asarray(coef).ravel()
+        self.rarity = rarity
+        self.intercept_ = float(np.asarray(intercept).ravel()[0])
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = self.coef_.shape[0]
+        if self.classes_.shape != (2,):
+            raise ValueError(f"Only binary models are supported, got classes {self.classes_.tolist()}")
+
+    @classmethod
+    def from_estimator(cls, model, dtype=np.float64):
+        rarity = scaler = None
+        if hasattr(model, 'named_steps'):
+            # Pipeline([('rarity', RarityTransformer), ('model', ...)]) from train.py --rarity or
+            # Pipeline([('scaler', StandardScaler), ('model', ...)]) from train_stream.py
+            steps = list(model.named_steps)
+            if steps == ['rarity', 'model']:
+                rarity = model.named_steps['rarity'].weights_
+            elif steps == ['scaler', 'model']:
+                scaler = model.named_steps['scaler']
+            else:
+                raise ValueError(f"Unsupported pipeline steps {steps}")
+            model = model.named_steps['model']
+        # SVC(kernel='linear') exposes coef_ as dual_coef_ @ support_vectors_
+        coef = getattr(model, 'coef_', None)
+        if coef is None or np.asarray(coef).shape[0] != 1:
+            raise ValueError(f"{type(model).__name__} is not a binary linear model")
+        coef = np.asarray(coef, dtype=np.float64).ravel()
+        intercept = float(np.asarray(model.intercept_).ravel()[0])
+        if scaler is not None:
+            # w . (x - mean) / scale + b  ==  (w / scale) . x + (b - (w / scale) . mean)
+            coef = coef / scaler.scale_
+            intercept = intercept - float(coef @ scaler.mean_)
+        return cls(coef.astype(dtype), np.asarray([intercept], dtype=dtype), model.classes_, rarity)
+
+    def decision_function(self, X):
+        if self.rarity is not None:
+            X = self.rarity.transform(X)
+        X = np.asarray(X, dtype=self.coef_.dtype)
+        return X @ self.coef_ + self.intercept_
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(np.intp)]
+
+    def predict_one(self, x):
+        """Label for a single feature vector (list or 1-D array)."""
+        if self.rarity is not None:
+            x = self.rarity.transform_one(x)
+        score = float(np.dot(self.coef_, np.asarray(x, dtype=self.coef_.dtype))) + self.intercept_
+        return self.classes_[1] if score > 0 else self.classes_[0]
+
+
+def load_linear_predictor(path):
+    """Registry loader: unpickle a .sav model and keep only its weights."""
+    return LinearPredictor.from_estimator(load_pickle(path))
+
+
+def verify(name, predictor=None):
+    """Compare the predictor with sklearn on every row of the bundled dataset.
+
+    Returns (number of rows, number of label mismatches, max abs score difference).
+    """
+    from dataset_cache import load_dataset
+
+    model = load_pickle(model_path(name))
+    if predictor is None:
+        predictor = LinearPredictor.from_estimator(model)
+    X = load_dataset(name).X()
+    expected = model.predict(X)
+    mismatches = int(np.count_nonzero(predictor.predict(X) != expected))
+    mismatches += sum(predictor.predict_one(row) != label for row, label in zip(X, expected))
+    max_diff = float(np.max(np.abs(predictor.decision_function(X) - model.decision_function(X))))
+    return len(X), mismatches, max_diff
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append',
+                        help='model to check (default: all three)')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float64')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.model or sorted(SPECS):
+        predictor = LinearPredictor.from_estimator(load_pickle(model_path(name)), dtype=np.dtype(args.dtype))
+        rows, mismatches, max_diff = verify(name, predictor)
+        failed = failed or mismatches > 0
+        print(f"{name}: {rows} rows, {mismatches} label mismatches, max |score diff| {max_diff:.3g}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
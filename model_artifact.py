@@ -0,0 +1,165 @@
+"""Versioned, memory-mappable model artifacts.
+
+Each model is stored as a directory next to its pickle, e.g.
+``saved_models/diabetes_model/``::
+
+    weights.npy     float array: the coefficients followed by the intercept
+    classes.npy     the class labels, in sklearn ``classes_`` order
+    manifest.json   schema version, model kind, feature order, dtype and
+                    sha256 checksums of the .npy files
+
+Models trained on rarity-weighted inputs (train.py --rarity) also store the
+rarity tables as ``rarity_edges.npy`` and ``rarity_counts.npy``; those
+artifacts are schema version 2 so that older readers refuse them instead of
+scoring unweighted inputs.
+
+The .npy files are opened with ``np.load(mmap_mode='r')`` so every process
+serving the models shares one page-cached copy, and loading needs neither
+pickle nor a matching scikit-learn version. The manifest is written last, so
+its mtime changes whenever an artifact is replaced.
+
+Usage:
+    python model_artifact.py convert [--dtype float32]   # .sav -> artifact directories
+    python model_artifact.py verify                      # checksums + labels vs sklearn
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from linear_model import LinearPredictor, load_linear_predictor
+from model_registry import file_digest, load_pickle
+from rarity import RarityWeights
+from specs import SPECS, get_spec, model_dir, model_path
+
+SCHEMA_VERSION = 2
+MANIFEST = 'manifest.json'
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def artifact_dir(name):
+    return os.path.join(model_dir, os.path.splitext(get_spec(name).model_file)[0])
+
+
+def write_artifact(path, predictor, features, kind, source=None, metadata=None):
+    """Write ``predictor`` to the artifact directory ``path``.
+
+    ``metadata`` (JSON-serializable, e.g. training parameters and scores) is
+    stored in the manifest as is.
+    """
+    if len(features) != predictor.n_features_in_:
+        raise ArtifactError(f"{len(features)} feature names for a model with {predictor.n_features_in_} weights")
+    os.makedirs(path, exist_ok=True)
+    weights = np.append(predictor.coef_, predictor.intercept_).astype(predictor.coef_.dtype)
+    np.save(os.path.join(path, 'weights.npy'), weights)
+    np.save(os.path.join(path, 'classes.npy'), predictor.classes_)
+    files = ['weights.npy', 'classes.npy']
+    if predictor.rarity is not None:
+        np.save(os.path.join(path, 'rarity_edges.npy'), predictor.rarity.edges)
+        np.save(os.path.join(path, 'rarity_counts.npy'), predictor.rarity.counts)
+        files += ['rarity_edges.npy', 'rarity_counts.npy']
+
+    manifest = {
+        'schema_version': 1 if predictor.rarity is None else 2,
+        'kind': kind,
+        'features': list(features),
+        'classes': predictor.classes_.tolist(),
+        'dtype': weights.dtype.name,
+        'checksums': {f: file_digest(os.path.join(path, f)) for f in files},
+    }
+    if predictor.rarity is not None:
+        manifest['rarity'] = {'n_bins': predictor.rarity.n_bins}
+    if source is not None:
+        manifest['source'] = {'file': os.path.basename(source), 'sha256': file_digest(source)}
+    if metadata is not None:
+        manifest['metadata'] = metadata
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('schema_version', 0) > SCHEMA_VERSION:
+        raise ArtifactError(f"{path} has schema version {manifest['schema_version']}, "
+                            f"this code understands up to {SCHEMA_VERSION}")
+    return manifest
+
+
+def load_artifact(path, verify=True):
+    """Memory-map an artifact directory into a LinearPredictor."""
+    manifest = read_manifest(path)
+    if verify:
+        for f, expected in manifest['checksums'].items():
+            if file_digest(os.path.join(path, f)) != expected:
+                raise ArtifactError(f"Checksum mismatch for {os.path.join(path, f)}")
+    weights = np.load(os.path.join(path, 'weights.npy'), mmap_mode='r')
+    classes = np.load(os.path.join(path, 'classes.npy'))
+    if weights.shape != (len(manifest['features']) + 1,):
+        raise ArtifactError(f"{path}: weights shape {weights.shape} does not match {len(manifest['features'])} features")
+    rarity = None
+    if 'rarity' in manifest:
+        rarity = RarityWeights(np.load(os.path.join(path, 'rarity_edges.npy'), mmap_mode='r'),
+                               np.load(os.path.join(path, 'rarity_counts.npy')))
+    predictor = LinearPredictor(weights[:-1], weights[-1:], classes, rarity)
+    predictor.feature_names = manifest['features']
+    return predictor
+
+
+def resolve_model_path(name):
+    """The file the app should load ``name`` from: the artifact manifest if it
+    has been converted, the .sav pickle otherwise."""
+    manifest = os.path.join(artifact_dir(name), MANIFEST)
+    return manifest if os.path.exists(manifest) else model_path(name)
+
+
+def load_model(path):
+    """Registry loader for paths returned by ``resolve_model_path``."""
+    if os.path.basename(path) == MANIFEST:
+        return load_artifact(os.path.dirname(path))
+    return load_linear_predictor(path)
+
+
+def convert(name, dtype=np.float64):
+    source = model_path(name)
+    model = load_pickle(source)
+    predictor = LinearPredictor.from_estimator(model, dtype=dtype)
+    path = artifact_dir(name)
+    write_artifact(path, predictor, get_spec(name).features, type(model).__name__, source=source)
+    return path
+
+
+def main(argv=None):
+    from linear_model import verify
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=['convert', 'verify'])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append',
+                        help='model to process (default: all three)')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float64')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.model or sorted(SPECS):
+        if args.command == 'convert':
+            print(f"{name}: wrote {convert(name, dtype=np.dtype(args.dtype))}")
+        else:
+            predictor = load_artifact(artifact_dir(name))
+            rows, mismatches, max_diff = verify(name, predictor)
+            failed = failed or mismatches > 0
+            print(f"{name}: checksums ok, {rows} rows, {mismatches} label mismatches, "
+                  f"max |score diff| {max_diff:.3g}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Process-wide registry of the saved prediction models.
+
+Streamlit re-executes app.py on every widget change, so the models must not be
+unpickled at the top of the script. The registry loads each model the first
+time it is asked for, keeps it for the lifetime of the process and reloads it
+only when the file on disk actually changes (mtime/size first, content hash
+to confirm).
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from specs import model_path
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class _Entry:
+    __slots__ = ('model', 'path', 'mtime_ns', 'size', 'digest')
+
+    def __init__(self, model, path, stat, digest):
+        self.model = model
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.digest = digest
+
+
+class ModelRegistry:
+    """Lazily loads models by name and shares them between all sessions.
+
+    ``loader`` turns a file path into a model and ``resolve`` maps a model name
+    to the file that should be watched for changes.
+    """
+
+    def __init__(self, loader=load_pickle, resolve=model_path):
+        self._loader = loader
+        self._resolve = resolve
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.metrics = {}
+
+    def _model_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _metrics(self, name):
+        # caller holds self._lock, which guards every metrics update: the hit
+        # counts are bumped on the lock-free fast path of concurrent sessions
+        return self.metrics.setdefault(name, {
+            'loads': 0,
+            'hits': 0,
+            'invalidations': 0,
+            'last_load_seconds': None,
+            'total_load_seconds': 0.0,
+        })
+
+    def _hit(self, name):
+        with self._lock:
+            self._metrics(name)['hits'] += 1
+
+    def get(self, name):
+        return self.get_versioned(name)[0]
+
+    def get_versioned(self, name):
+        """Return (model, content hash of the file it was loaded from)."""
+        path = self._resolve(name)
+        stat = os.stat(path)
+        entry = self._entries.get(name)
+        if entry is not None and entry.path == path and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            self._hit(name)
+            return entry.model, entry.digest
+
+        with self._model_lock(name):
+            entry = self._entries.get(name)
+            stat = os.stat(path)
+            if entry is not None and entry.path == path and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                # another session reloaded it while we waited for the lock
+                self._hit(name)
+                return entry.model, entry.digest
+
+            digest = file_digest(path)
+            if entry is not None and entry.path == path and entry.digest == digest:
+                # touched but not modified
+                entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                self._hit(name)
+                return entry.model, entry.digest
+
+            start = time.perf_counter()
+            model = self._loader(path)
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                metrics = self._metrics(name)
+                if entry is not None:
+                    metrics['invalidations'] += 1
+                metrics['loads'] += 1
+                metrics['last_load_seconds'] = elapsed
+                metrics['total_load_seconds'] += elapsed
+            self._entries[name] = _Entry(model, path, stat, digest)
+            return model, digest
+
+    def version(self, name):
+        """Content hash of the currently loaded model, loading it if needed."""
+        return self.get_versioned(name)[1]
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def loaded(self):
+        return sorted(self._entries)
@@ -0,0 +1,94 @@
+"""Bounded LRU/TTL cache of prediction results.
+
+Entries are keyed on the model name and a digest of the parsed feature vector
+(float64 bytes, with -0.0 folded into 0.0), so the same patient submitted
+twice, or re-clicking a predict button, hits the cache whatever the input
+widgets or JSON looked like. Every lookup carries the version of the model
+(the registry's content hash); when it changes, all entries of that model are
+dropped.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def feature_key(row):
+    row = np.asarray(row, dtype=np.float64) + 0.0
+    return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+
+class PredictionCache:
+    def __init__(self, maxsize=10_000, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, name, version):
+        if self._versions.get(name, version) != version:
+            stale = [key for key in self._entries if key[0] == name]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        self._versions[name] = version
+
+    def get(self, name, version, row):
+        """Cached result for ``row``, or None."""
+        key = (name, feature_key(row))
+        with self._lock:
+            self._check_version(name, version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, name, version, row, value):
+        key = (name, feature_key(row))
+        with self._lock:
+            self._check_version(name, version)
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, name, version, row, compute):
+        value = self.get(name, version, row)
+        if value is None:
+            value = compute()
+            self.put(name, version, row, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,390 @@
+"""Stand-alone HTTP/JSON prediction service with request micro-batching.
+
+Endpoints:
+    POST /predict/diabetes, /predict/heart, /predict/parkinsons
+        {"features": [...]}             one row, in feature order or as a
+                                        {feature name: value} object
+        {"instances": [[...], ...]}     several rows in one request
+    POST /screen
+        {"record": {...}}               one patient record (see screening.py)
+        {"records": [{...}, ...]}       scored against all three models in
+                                        one fused product per request
+    GET /metrics    per-model request/row/batch counters, p50/p99 latency,
+                    prediction cache statistics and input drift scores
+    GET /health
+
+With ``--shadow heart=<candidate>`` the rows of every request are also scored
+by a candidate model on a background thread, off the request path, and the
+disagreements logged (see shadow.py); its counters are under ``shadow`` in
+GET /metrics.
+
+Rows are validated with ``specs.parse_features``, the same checks the app
+pages apply; invalid or empty requests get a 400 JSON error, a batch not
+scored within ``--timeout`` seconds a 503 and a failing model a 500. Each model has a MicroBatcher: request threads enqueue their rows
+and a single worker thread drains the queue into batches of at most
+``max_batch_size`` rows, waiting at most ``max_wait_ms`` for a batch to fill,
+and scores every batch with one vectorized ``decision_function`` call. Rows
+already in the prediction cache (``--cache-size``) skip the batcher. Every
+validated row is also counted by the input drift monitor (drift_monitor.py).
+
+One process is bound by the standard library HTTP server rather than by the
+models: on one core it answers about 2,000 single-row requests/s (16
+keep-alive connections, p50 6 ms, p99 19 ms, benchmarks/load_generator.py),
+or about 34,000 rows/s in 100-row "instances" requests. prefork_server.py
+scales it out with one process per core on a shared socket.
+
+Usage:
+    python prediction_service.py --port 8000 --max-batch-size 256 --max-wait-ms 2
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from drift_monitor import DriftMonitor
+from model_artifact import load_model, resolve_model_path
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from screening import Screener
+from shadow import ShadowEvaluator, parse_shadow_specs
+from specs import SPECS, parse_features
+
+
+class LatencyStats:
+    """Counters plus a fixed-size ring of recent latencies for percentiles."""
+
+    def __init__(self, window=10_000):
+        self._lock = threading.Lock()
+        self._latencies = np.zeros(window)
+        self._next = 0
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.batch_rows = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def record_request(self, seconds, rows):
+        with self._lock:
+            self._latencies[self._next % len(self._latencies)] = seconds
+            self._next += 1
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self, rows):
+        with self._lock:
+            self.batches += 1
+            self.batch_rows += rows
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            recent = self._latencies[:min(self._next, len(self._latencies))]
+            p50, p99 = np.percentile(recent, [50, 99]) if len(recent) else (0.0, 0.0)
+            elapsed = time.monotonic() - self.started
+            return {
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'errors': self.errors,
+                'mean_batch_rows': self.batch_rows / self.batches if self.batches else 0.0,
+                'p50_ms': float(p50) * 1e3,
+                'p99_ms': float(p99) * 1e3,
+                'requests_per_second': self.requests / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+class ModelError(Exception):
+    """The model failed to score a batch (as opposed to an invalid request)."""
+
+
+class MicroBatcher:
+    """Collects rows from concurrent callers into vectorized predict calls.
+
+    ``get_model`` returns (model, version) and is called once per batch, so a
+    model reloaded by the registry is picked up without restarting the service.
+    """
+
+    def __init__(self, get_model, max_batch_size=256, max_wait_ms=2.0, stats=None):
+        self._get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1e3
+        self.stats = stats or LatencyStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue a list of rows; the future resolves to (labels, scores, model version)."""
+        future = Future()
+        self._queue.put((rows, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            n_rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while n_rows < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                n_rows += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch):
+        try:
+            model, version = self._get_model()
+            X = np.array([row for rows, _ in batch for row in rows], dtype=np.float64)
+            scores = model.decision_function(X)
+            labels = model.classes_[(scores > 0).astype(np.intp)]
+        except Exception as e:
+            error = ModelError(f"{type(e).__name__}: {e}")
+            error.__cause__ = e
+            for _, future in batch:
+                future.set_exception(error)
+            return
+        self.stats.record_batch(len(X))
+        start = 0
+        for rows, future in batch:
+            end = start + len(rows)
+            future.set_result((labels[start:end].tolist(), scores[start:end].tolist(), version))
+            start = end
+
+
+class PredictionService:
+    """Validates requests, answers repeated rows from ``cache`` (a
+    PredictionCache, optional) and sends the rest to the model's batcher.
+    ``drift`` defaults to a DriftMonitor against the dataset/ files;
+    ``shadows`` maps model names to ShadowEvaluators. A request waits at most
+    ``timeout`` seconds for its batch to be scored."""
+
+    def __init__(self, registry=None, max_batch_size=256, max_wait_ms=2.0, cache=None, drift=None, shadows=None,
+                 timeout=30.0):
+        self.registry = registry or ModelRegistry(loader=load_model, resolve=resolve_model_path)
+        self.timeout = timeout
+        self.cache = cache
+        self.drift = drift or DriftMonitor.from_datasets()
+        self.shadows = shadows or {}
+        self.batchers = {
+            name: MicroBatcher(lambda name=name: self.registry.get_versioned(name), max_batch_size, max_wait_ms)
+            for name in SPECS
+        }
+        self.screener = Screener(self.registry)
+        self.screen_stats = LatencyStats()
+
+    def predict(self, name, rows, timeout=None):
+        """Validate and score ``rows``; returns (labels, scores)."""
+        if not rows:
+            raise ValueError("instances must not be empty")
+        timeout = timeout or self.timeout
+        start = time.perf_counter()
+        batcher = self.batchers[name]
+        rows = [parse_features(name, row) for row in rows]
+        self.drift.observe_many(name, rows)
+        if self.cache is None:
+            labels, scores, _ = batcher.submit(rows).result(timeout)
+        else:
+            labels, scores = self._predict_cached(name, batcher, rows, timeout)
+        batcher.stats.record_request(time.perf_counter() - start, len(rows))
+        shadow = self.shadows.get(name)
+        if shadow is not None:
+            shadow.submit(rows)
+        return labels, scores
+
+    def _predict_cached(self, name, batcher, rows, timeout):
+        version = self.registry.version(name)
+        results = [self.cache.get(name, version, row) for row in rows]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            labels, scores, version = batcher.submit([rows[i] for i in missing]).result(timeout)
+            for i, label, score in zip(missing, labels, scores):
+                results[i] = (label, score)
+                self.cache.put(name, version, rows[i], results[i])
+        return [label for label, _ in results], [score for _, score in results]
+
+    def screen(self, records):
+        """Score patient records against every model; one result dict per record."""
+        if not records:
+            raise ValueError("records must not be empty")
+        start = time.perf_counter()
+        results = self.screener.screen_records(records)
+        self.screen_stats.record_request(time.perf_counter() - start, len(records))
+        return results
+
+    def metrics(self):
+        metrics = {name: batcher.stats.snapshot() for name, batcher in self.batchers.items()}
+        metrics['screen'] = self.screen_stats.snapshot()
+        metrics['drift'] = self.drift.scores()
+        if self.shadows:
+            metrics['shadow'] = {name: shadow.stats() for name, shadow in self.shadows.items()}
+        if self.cache is not None:
+            metrics['cache'] = self.cache.stats()
+        return metrics
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.close()
+        for shadow in self.shadows.values():
+            shadow.close()
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; without TCP_NODELAY each
+    # keep-alive response waits for the client's delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, stats, e):
+        stats.record_error()
+        if isinstance(e, FutureTimeoutError):
+            status, message = 503, 'Timed out waiting for the model'
+        elif isinstance(e, KeyError):
+            status, message = 400, f'Missing field {e}'
+        elif isinstance(e, (ValueError, TypeError)):
+            status, message = 400, str(e)
+        else:
+            status, message = 500, f'Internal error: {e}'
+        self._send_json(status, {'error': message})
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._send_json(200, self.service.metrics())
+        elif self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if self.path == '/screen':
+            self._screen(body)
+            return
+        prefix = '/predict/'
+        name = self.path[len(prefix):] if self.path.startswith(prefix) else None
+        if name not in SPECS:
+            self._send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+
+        try:
+            payload = json.loads(body)
+            if 'instances' in payload:
+                rows, single = payload['instances'], False
+            else:
+                rows, single = [payload['features']], True
+            labels, scores = self.service.predict(name, rows)
+        except Exception as e:
+            self._send_error_json(self.service.batchers[name].stats, e)
+            return
+
+        results = [{'prediction': label, 'score': score, 'result': SPECS[name].labels[label]}
+                   for label, score in zip(labels, scores)]
+        self._send_json(200, results[0] if single else {'predictions': results})
+
+    def _screen(self, body):
+        try:
+            payload = json.loads(body)
+            if 'records' in payload:
+                records, single = payload['records'], False
+            else:
+                records, single = [payload['record']], True
+            results = self.service.screen(records)
+        except Exception as e:
+            self._send_error_json(self.service.screen_stats, e)
+            return
+        self._send_json(200, results[0] if single else {'results': results})
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def make_server(host='127.0.0.1', port=8000, service=None, sock=None, **batch_options):
+    """Build the HTTP server; ``sock`` serves an already listening socket
+    (e.g. one inherited from a pre-fork parent) instead of binding a new one."""
+    service = service or PredictionService(**batch_options)
+    handler = type('Handler', (PredictionHandler,), {'service': service})
+    if sock is None:
+        return PredictionServer((host, port), handler), service
+    server = PredictionServer(sock.getsockname(), handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = sock
+    return server, service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--cache-size', type=int, default=10_000, help='cached predictions (0 = no cache)')
+    parser.add_argument('--cache-ttl', type=float, default=3600.0, help='seconds a cached prediction stays valid')
+    parser.add_argument('--shadow', action='append', default=[], metavar='MODEL=PATH',
+                        help='also score MODEL requests with the candidate at PATH, off the request path')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds a request waits for its batch (then 503)')
+    parser.add_argument('--shadow-capacity', type=int, default=10_000, help='queued shadow requests before dropping')
+    args = parser.parse_args(argv)
+
+    try:
+        candidates = parse_shadow_specs(args.shadow)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = PredictionCache(args.cache_size, args.cache_ttl) if args.cache_size > 0 else None
+    registry = ModelRegistry(loader=load_model, resolve=resolve_model_path)
+    shadows = {name: ShadowEvaluator.from_path(name, lambda name=name: registry.get_versioned(name), path,
+                                               capacity=args.shadow_capacity)
+               for name, path in candidates.items()}
+    server, service = make_server(args.host, args.port, registry=registry, max_batch_size=args.max_batch_size,
+                                  max_wait_ms=args.max_wait_ms, cache=cache, shadows=shadows,
+                                  timeout=args.timeout)
+    for name in SPECS:
+        service.registry.get(name)
+    print(f"serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Pre-fork serving of prediction_service.py across several processes.
+
+The parent binds the listening socket, loads all three models once (the
+memory-mapped artifacts from model_artifact.py, so the weights live in the
+page cache rather than on any process heap) and forks ``--workers`` children
+that inherit both. Each child runs its own HTTP server and micro-batchers on
+the shared socket; the kernel spreads incoming connections between them.
+
+The parent supervises the children: a worker that exits is replaced, and every
+``--report-interval`` seconds the RSS of each worker is printed together with
+its proportional set size and the private/shared split from
+/proc/<pid>/smaps_rollup; pages still shared copy-on-write with the parent
+show up as shared, not private. Linux only.
+
+Usage:
+    python prefork_server.py --port 8000 --workers 32
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+from model_artifact import load_model, resolve_model_path
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
+from prediction_service import PredictionService, make_server
+from specs import SPECS
+
+
+def memory_kb(pid):
+    """Memory figures of ``pid`` in kB from /proc/<pid>/smaps_rollup: total RSS,
+    proportional set size, and the private and shared parts of the RSS."""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[key] = int(value.split()[0])
+    except FileNotFoundError:
+        return {}
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+
+def format_memory_report(workers):
+    columns = ('rss', 'pss', 'private', 'shared')
+    lines = [f"{'pid':>8}" + ''.join(f"{c + ' MB':>12}" for c in columns)]
+    for pid in sorted(workers):
+        memory = memory_kb(pid)
+        lines.append(f"{pid:>8}" + ''.join(f"{memory.get(c, 0) / 1024:>12.1f}" for c in columns))
+    return '\n'.join(lines)
+
+
+def serve_worker(sock, registry, max_batch_size, max_wait_ms, cache_size, cache_ttl):
+    # default signal handling again: the parent's handlers are inherited
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # threads do not survive fork, so the batchers are created in the child
+    cache = PredictionCache(cache_size, cache_ttl) if cache_size > 0 else None
+    service = PredictionService(registry, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, cache=cache)
+    server, _ = make_server(service=service, sock=sock)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+class Supervisor:
+    def __init__(self, sock, registry, workers, max_batch_size=256, max_wait_ms=2.0, report_interval=30.0,
+                 cache_size=10_000, cache_ttl=3600.0):
+        self.sock = sock
+        self.registry = registry
+        self.n_workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.report_interval = report_interval
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.workers = set()
+        self.restarts = 0
+        self._stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            serve_worker(self.sock, self.registry, self.max_batch_size, self.max_wait_ms,
+                         self.cache_size, self.cache_ttl)
+        self.workers.add(pid)
+        return pid
+
+    def stop(self, *_):
+        self._stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # keep the (now immutable) parent heap out of the cyclic GC so the
+        # children do not touch, and therefore copy, those pages
+        gc.freeze()
+        for _ in range(self.n_workers):
+            self.spawn()
+
+        next_report = time.monotonic() + self.report_interval
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.2)
+                if self.report_interval and time.monotonic() >= next_report:
+                    print(format_memory_report(self.workers), file=sys.stderr, flush=True)
+                    next_report = time.monotonic() + self.report_interval
+                continue
+            self.workers.discard(pid)
+            if not self._stopping:
+                self.restarts += 1
+                print(f"worker {pid} exited with status {status}, restarting "
+                      f"({self.restarts} restarts so far)", file=sys.stderr, flush=True)
+                self.spawn()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--report-interval', type=float, default=30.0, help='seconds between memory reports (0 = off)')
+    parser.add_argument('--cache-size', type=int, default=10_000, help='cached predictions per worker (0 = no cache)')
+    parser.add_argument('--cache-ttl', type=float, default=3600.0)
+    args = parser.parse_args(argv)
+
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    registry = ModelRegistry(loader=load_model, resolve=resolve_model_path)
+    for name in SPECS:
+        registry.get(name)
+    print(f"serving on http://{args.host}:{sock.getsockname()[1]} with {args.workers} workers", file=sys.stderr)
+
+    supervisor = Supervisor(sock, registry, args.workers, args.max_batch_size, args.max_wait_ms,
+                            args.report_interval, args.cache_size, args.cache_ttl)
+    supervisor.run()
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Fused screening of patient records against all three models at once.
+
+A patient record holds the union of the three models' features, with fields
+that mean the same thing stored once: ``age`` feeds both the diabetes model
+(its ``Age`` feature) and the heart model. ``RECORD_FIELDS`` is the record's
+column order.
+
+Because every model is linear, scoring a batch of records against all of them
+is one matrix product ``X @ W + b``, where column k of ``W`` holds model k's
+weights at the rows of its fields and zeros everywhere else (a block-sparse
+matrix with 42 rows and 3 columns, small enough that the dense product with
+its zero blocks is faster than any sparse format). Models trained on
+rarity-weighted inputs (the heart model) get their own block of rows in
+``W``, below the record fields: their fields are rarity-transformed and
+multiplied with that block instead.
+
+Usage:
+    python screening.py records.csv scored.csv      # CSV with the RECORD_FIELDS columns
+"""
+import argparse
+import time
+
+import numpy as np
+
+from specs import SPECS, check_not_boolean, check_row_type, get_spec
+
+# record field for a model feature, where the two names differ
+ALIASES = {('diabetes', 'Age'): 'age'}
+
+
+def record_field(name, feature):
+    return ALIASES.get((name, feature), feature)
+
+
+RECORD_FIELDS = list(dict.fromkeys(record_field(name, f) for name, spec in SPECS.items() for f in spec.features))
+# fields that a page rejecting negative inputs (spec.non_negative) reads
+NON_NEGATIVE_FIELDS = sorted({record_field(name, f) for name, spec in SPECS.items() if spec.non_negative
+                              for f in spec.features}, key=RECORD_FIELDS.index)
+
+
+def parse_records(records):
+    """Validate records (mappings keyed by field name, or sequences in
+    ``RECORD_FIELDS`` order) into a float64 matrix; raises ValueError like
+    ``specs.parse_features``."""
+    rows = []
+    for record in records:
+        check_row_type(record, 'A patient record')
+        if isinstance(record, dict):
+            missing = [f for f in RECORD_FIELDS if f not in record]
+            if missing:
+                raise ValueError(f"Missing fields in the patient record: {missing}")
+            record = [record[f] for f in RECORD_FIELDS]
+        elif len(record) != len(RECORD_FIELDS):
+            raise ValueError(f"A patient record has {len(RECORD_FIELDS)} fields, got {len(record)}")
+        check_not_boolean(record, 'A patient record')
+        rows.append(record)
+    try:
+        X = np.array(rows, dtype=np.float64).reshape(len(rows), len(RECORD_FIELDS))
+    except (TypeError, ValueError) as e:
+        raise ValueError(str(e)) from None
+    validate(X)
+    return X
+
+
+def validate(X):
+    if not np.isfinite(X).all():
+        raise ValueError("All features must be finite numbers.")
+    non_negative = [RECORD_FIELDS.index(f) for f in NON_NEGATIVE_FIELDS]
+    if (X[:, non_negative] < 0).any():
+        raise ValueError("Please enter valid input values.")
+
+
+class FusedLinearModel:
+    """Every model's decision function over record columns as one product.
+
+    ``predictors`` maps model names to linear_model.LinearPredictor instances.
+    """
+
+    def __init__(self, predictors):
+        self.names = list(predictors)
+        index = {f: i for i, f in enumerate(RECORD_FIELDS)}
+        blocks = []
+        n_inputs = len(RECORD_FIELDS)
+        for name, predictor in predictors.items():
+            columns = [index[record_field(name, f)] for f in get_spec(name).features]
+            if predictor.rarity is not None:
+                blocks.append((name, n_inputs, np.array(columns), predictor.rarity))
+                n_inputs += len(columns)
+
+        self.weights = np.zeros((n_inputs, len(self.names)))
+        self.intercepts = np.zeros(len(self.names))
+        offsets = {name: offset for name, offset, _, _ in blocks}
+        for k, (name, predictor) in enumerate(predictors.items()):
+            if name in offsets:
+                self.weights[offsets[name]:offsets[name] + predictor.n_features_in_, k] = predictor.coef_
+            else:
+                columns = [index[record_field(name, f)] for f in get_spec(name).features]
+                self.weights[columns, k] = predictor.coef_
+            self.intercepts[k] = predictor.intercept_
+        self.classes = np.stack([predictor.classes_ for predictor in predictors.values()])
+        self._rarity_blocks = [(offset, columns, rarity) for _, offset, columns, rarity in blocks]
+
+    def decision_function(self, X):
+        """(n_records, n_models) scores for a float matrix in RECORD_FIELDS order."""
+        X = np.asarray(X, dtype=np.float64)
+        n_fields = X.shape[1]
+        scores = X @ self.weights[:n_fields]
+        scores += self.intercepts
+        # rarity-weighted blocks: one more small product each, instead of
+        # copying the records into a widened matrix
+        for offset, columns, rarity in self._rarity_blocks:
+            scores += rarity.transform(X[:, columns]) @ self.weights[offset:offset + len(columns)]
+        return scores
+
+    def predict(self, X):
+        """Return (labels, scores), both (n_records, n_models)."""
+        scores = self.decision_function(X)
+        labels = np.take_along_axis(self.classes.T, (scores > 0).astype(np.intp), axis=0)
+        return labels, scores
+
+
+class Screener:
+    """Fused screening over the models of a ModelRegistry; the fused weights
+    are rebuilt whenever the registry loads a new version of any model."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._versions = None
+        self._model = None
+
+    def model(self):
+        loaded = {name: self.registry.get_versioned(name) for name in SPECS}
+        versions = tuple(version for _, version in loaded.values())
+        if versions != self._versions:
+            # built before it is published: concurrent callers see the old or the new model
+            model = FusedLinearModel({name: predictor for name, (predictor, _) in loaded.items()})
+            self._model, self._versions = model, versions
+        return self._model
+
+    def screen(self, X):
+        """Score a validated record matrix; returns {model name: (labels, scores)}."""
+        model = self.model()
+        labels, scores = model.predict(X)
+        return {name: (labels[:, k], scores[:, k]) for k, name in enumerate(model.names)}
+
+    def screen_records(self, records):
+        """JSON-ready results for a list of records, one dict per record."""
+        results = self.screen(parse_records(records))
+        return [
+            {name: {'prediction': int(labels[i]), 'score': float(scores[i]),
+                    'result': SPECS[name].labels[int(labels[i])]}
+             for name, (labels, scores) in results.items()}
+            for i in range(len(records))
+        ]
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from model_artifact import load_model, resolve_model_path
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('input')
+    parser.add_argument('output')
+    args = parser.parse_args(argv)
+
+    screener = Screener(ModelRegistry(loader=load_model, resolve=resolve_model_path))
+    df = pd.read_csv(args.input, encoding='utf-8-sig')
+    X = df[RECORD_FIELDS].to_numpy(dtype=np.float64)
+    validate(X)
+    start = time.perf_counter()
+    results = screener.screen(X)
+    elapsed = time.perf_counter() - start
+    for name, (labels, scores) in results.items():
+        df[f'{name}_prediction'] = labels
+        df[f'{name}_score'] = scores
+    df.to_csv(args.output, index=False)
+    print(f"screened {len(df)} records against {len(results)} models in {elapsed * 1e3:.1f} ms -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""Shadow evaluation of a candidate model against live traffic.
+
+A ShadowEvaluator takes the rows of every prediction request of one model
+(``submit``: a non-blocking put on a bounded queue; when the queue is full the
+rows are dropped and counted, never waited for) and scores them on a
+background thread with both the served model and the candidate, in one
+vectorized call each. Every row is appended to a log of fixed-size binary
+records::
+
+    time            float64   unix time the batch was scored
+    primary_label   int8      label of the served model
+    candidate_label int8
+    primary_score   float32   decision scores
+    candidate_score float32
+    primary_us      float32   scoring time per row, amortized over the batch
+    candidate_us    float32
+    x               float64[n_features]  the input row
+
+with the model, features, candidate path and record layout in ``<log>.json``.
+Logs go to ``saved_models/shadow/<model>-<candidate sha256[:12]>.shadow`` and
+are appended to across restarts; a record cut short by a crash is dropped
+when the log is reopened (and ignored by ``read_log`` until then).
+
+The candidate is a .sav pickle, an artifact directory or manifest, or a
+version directory written by train.py. The app shadows the models listed in
+HEALTH_APP_SHADOW (``heart=saved_models/versions/heart_disease_model/<v>``,
+comma separated), the prediction service those given with ``--shadow``.
+
+Usage:
+    python shadow.py replay saved_models/shadow/heart-0123456789ab.shadow [--candidate PATH]
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from model_artifact import MANIFEST, load_model
+from model_registry import file_digest, load_pickle
+from specs import SPECS, get_spec, model_dir
+
+SCHEMA_VERSION = 1
+LOG_DIR = os.path.join(model_dir, 'shadow')
+
+
+def record_dtype(n_features):
+    return np.dtype([('time', '<f8'), ('primary_label', 'i1'), ('candidate_label', 'i1'),
+                     ('primary_score', '<f4'), ('candidate_score', '<f4'),
+                     ('primary_us', '<f4'), ('candidate_us', '<f4'), ('x', '<f8', (n_features,))])
+
+
+def candidate_file(name, path):
+    """The file a candidate is loaded from: an artifact manifest or a .sav."""
+    if os.path.isdir(path):
+        stem = os.path.splitext(get_spec(name).model_file)[0]
+        for candidate in (os.path.join(path, MANIFEST), os.path.join(path, stem, MANIFEST),
+                          os.path.join(path, get_spec(name).model_file)):
+            if os.path.exists(candidate):
+                return candidate
+        raise FileNotFoundError(f"No {name} model in {path}")
+    return path
+
+
+def load_candidate(name, path):
+    """Load a candidate like the registry does; .sav models that are not
+    linear are kept as the sklearn estimator."""
+    path = candidate_file(name, path)
+    try:
+        return load_model(path)
+    except ValueError:
+        if os.path.basename(path) == MANIFEST:
+            raise
+        return load_pickle(path)
+
+
+def score(model, X):
+    """(labels, decision scores) of any binary model."""
+    if hasattr(model, 'decision_function'):
+        scores = np.asarray(model.decision_function(X), dtype=np.float64)
+        labels = np.asarray(model.classes_)[(scores > 0).astype(np.intp)]
+    else:
+        # estimators without a decision function: the probability margin
+        scores = model.predict_proba(X)[:, 1] - 0.5
+        labels = np.asarray(model.classes_)[(scores > 0).astype(np.intp)]
+    return labels, scores
+
+
+class ShadowEvaluator:
+    """Scores the rows submitted for model ``name`` with the served model
+    (``get_primary`` returns (model, version), like MicroBatcher's
+    ``get_model``) and ``candidate`` off the request path, logging both."""
+
+    def __init__(self, name, get_primary, candidate, log_path, candidate_path=None,
+                 capacity=10_000, max_batch_size=256):
+        self.name = name
+        self.features = get_spec(name).features
+        self.candidate = candidate
+        self.log_path = log_path
+        self.dtype = record_dtype(len(self.features))
+        self._get_primary = get_primary
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue(maxsize=capacity)
+        self._lock = threading.Lock()
+        self.submitted = self.dropped = self.scored = self.disagreements = self.errors = 0
+        self._primary_seconds = self._candidate_seconds = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        header = {'schema_version': SCHEMA_VERSION, 'model': name, 'features': self.features,
+                  'candidate': candidate_path, 'record_dtype': self.dtype.descr}
+        if not os.path.exists(log_path + '.json'):
+            with open(log_path + '.json', 'w') as f:
+                json.dump(header, f, indent=2)
+        self._log = open(log_path, 'ab')
+        # drop a record cut short by a crash, so that new records stay aligned
+        size = self._log.tell()
+        if size % self.dtype.itemsize:
+            self._log.truncate(size // self.dtype.itemsize * self.dtype.itemsize)
+        self._thread = threading.Thread(target=self._run, name=f'shadow-{name}', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_path(cls, name, get_primary, candidate_path, log_dir=LOG_DIR, **options):
+        """Evaluator for the candidate at ``candidate_path``, logging to
+        ``log_dir/<name>-<candidate sha256[:12]>.shadow``."""
+        path = candidate_file(name, candidate_path)
+        log_path = os.path.join(log_dir, f'{name}-{file_digest(path)[:12]}.shadow')
+        return cls(name, get_primary, load_candidate(name, path), log_path, candidate_path=path, **options)
+
+    def submit(self, rows):
+        """Queue validated rows for shadow scoring; never blocks."""
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(rows)
+            return False
+        with self._lock:
+            self.submitted += len(rows)
+        return True
+
+    def close(self):
+        """Score what is queued, then stop the worker and close the log."""
+        self._queue.put(None)
+        self._thread.join()
+        self._log.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            n_rows = len(item)
+            while n_rows < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                n_rows += len(item)
+            self._score([row for rows in batch for row in rows])
+
+    def _score(self, rows):
+        try:
+            primary, _ = self._get_primary()
+            X = np.array(rows, dtype=np.float64).reshape(len(rows), len(self.features))
+            start = time.perf_counter()
+            primary_labels, primary_scores = score(primary, X)
+            primary_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            candidate_labels, candidate_scores = score(self.candidate, X)
+            candidate_seconds = time.perf_counter() - start
+        except Exception:
+            with self._lock:
+                self.errors += len(rows)
+            return
+        records = np.empty(len(X), dtype=self.dtype)
+        records['time'] = time.time()
+        records['primary_label'] = primary_labels
+        records['candidate_label'] = candidate_labels
+        records['primary_score'] = primary_scores
+        records['candidate_score'] = candidate_scores
+        records['primary_us'] = primary_seconds / len(X) * 1e6
+        records['candidate_us'] = candidate_seconds / len(X) * 1e6
+        records['x'] = X
+        self._log.write(records.tobytes())
+        self._log.flush()
+        with self._lock:
+            self.scored += len(X)
+            self.disagreements += int(np.count_nonzero(primary_labels != candidate_labels))
+            self._primary_seconds += primary_seconds
+            self._candidate_seconds += candidate_seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'scored': self.scored,
+                'errors': self.errors,
+                'queued': self._queue.qsize(),
+                'disagreements': self.disagreements,
+                'disagreement_rate': self.disagreements / self.scored if self.scored else 0.0,
+                'primary_us_per_row': self._primary_seconds / self.scored * 1e6 if self.scored else 0.0,
+                'candidate_us_per_row': self._candidate_seconds / self.scored * 1e6 if self.scored else 0.0,
+                'log': self.log_path,
+            }
+
+
+def parse_shadow_specs(specs):
+    """{model: candidate path} from ``name=path`` strings."""
+    shadows = {}
+    for spec in specs:
+        name, sep, path = spec.partition('=')
+        name = name.strip()
+        if not sep or name not in SPECS or not path.strip():
+            raise ValueError(f"Expected <model>=<candidate path> with a model in {sorted(SPECS)}, got {spec!r}")
+        shadows[name] = path.strip()
+    return shadows
+
+
+def from_environment(registry, environ=os.environ):
+    """ShadowEvaluators for the models in HEALTH_APP_SHADOW, scoring against
+    the models served by ``registry``."""
+    value = environ.get('HEALTH_APP_SHADOW', '')
+    specs = [spec for spec in value.split(',') if spec.strip()]
+    return {name: ShadowEvaluator.from_path(name, lambda name=name: registry.get_versioned(name), path)
+            for name, path in parse_shadow_specs(specs).items()}
+
+
+def read_log(path):
+    """(header, records) of a shadow log; records is a read-only memmap."""
+    with open(path + '.json') as f:
+        header = json.load(f)
+    # JSON turned the descr tuples, and the shape of x, into lists
+    dtype = np.dtype([(field[0], field[1], tuple(field[2])) if len(field) > 2 else tuple(field)
+                      for field in header['record_dtype']])
+    n = os.path.getsize(path) // dtype.itemsize
+    records = np.memmap(path, dtype=dtype, mode='r', shape=(n,)) if n else np.empty(0, dtype=dtype)
+    return header, records
+
+
+def replay(path, candidate=None, primary=None, chunk_size=100_000):
+    """Re-score every logged input with ``candidate`` and ``primary`` (loaded
+    models; default: the logged candidate and the model served now).
+    Returns a dict of agreement statistics."""
+    from model_artifact import resolve_model_path
+
+    header, records = read_log(path)
+    name = header['model']
+    candidate = candidate or load_candidate(name, header['candidate'])
+    primary = primary or load_model(resolve_model_path(name))
+    confusion = np.zeros((2, 2), dtype=np.int64)
+    max_diff = 0.0
+    seconds = 0.0
+    for start in range(0, len(records), chunk_size):
+        X = np.asarray(records['x'][start:start + chunk_size])
+        begin = time.perf_counter()
+        primary_labels, primary_scores = score(primary, X)
+        candidate_labels, candidate_scores = score(candidate, X)
+        seconds += time.perf_counter() - begin
+        pairs = 2 * np.searchsorted(primary.classes_, primary_labels) + np.searchsorted(primary.classes_, candidate_labels)
+        confusion += np.bincount(pairs, minlength=4).reshape(2, 2)
+        max_diff = max(max_diff, float(np.max(np.abs(candidate_scores - primary_scores))))
+    rows = len(records)
+    return {
+        'model': name,
+        'rows': rows,
+        'disagreements': int(confusion[0, 1] + confusion[1, 0]),
+        'primary_0_candidate_1': int(confusion[0, 1]),
+        'primary_1_candidate_0': int(confusion[1, 0]),
+        'max_score_diff': max_diff,
+        'rows_per_second': rows / seconds if seconds > 0 else 0.0,
+        'logged_disagreements': int(np.count_nonzero(records['primary_label'] != records['candidate_label'])),
+        'logged_primary_us': float(np.median(records['primary_us'])) if rows else 0.0,
+        'logged_candidate_us': float(np.median(records['candidate_us'])) if rows else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=['replay'])
+    parser.add_argument('log', help='shadow log file (the .shadow file, not its .json header)')
+    parser.add_argument('--candidate', help='re-score with this candidate instead of the logged one')
+    parser.add_argument('--primary', help='compare with this model instead of the one served now')
+    args = parser.parse_args(argv)
+
+    header, _ = read_log(args.log)
+    name = header['model']
+    candidate = load_candidate(name, args.candidate) if args.candidate else None
+    primary = load_candidate(name, args.primary) if args.primary else None
+    result = replay(args.log, candidate, primary)
+    print(f"{name}: {result['rows']} logged rows re-scored at {result['rows_per_second']:,.0f} rows/s")
+    print(f"  disagreements now {result['disagreements']} ({result['primary_0_candidate_1']} 0->1, "
+          f"{result['primary_1_candidate_0']} 1->0), when logged {result['logged_disagreements']}")
+    print(f"  max |score diff| {result['max_score_diff']:.3g}; logged median scoring time "
+          f"{result['logged_primary_us']:.2f} us/row served, {result['logged_candidate_us']:.2f} us/row candidate")
+
+
+if __name__ == '__main__':
+    main()
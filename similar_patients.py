@@ -0,0 +1,289 @@
+"""Persisted nearest-neighbour index of the reference cohorts.
+
+Every disease gets an index over its dataset's standardized features (each
+feature centred on its mean and divided by its standard deviation, so that no
+unit dominates the distance), stored next to the columnar dataset cache in
+``<csv directory>/cache/<stem>/neighbors/``::
+
+    points.npy      float32 standardized rows, reordered into KD-tree leaves
+    rows.npy        int64 cohort row number of every point
+    leaves.npy      int64 (start, stop) of every leaf in points.npy
+    lower.npy       float32 lower corner of every leaf's bounding box
+    upper.npy       float32 upper corner
+    outcomes.npy    the label column, in cohort row order
+    manifest.json   features, mean, scale, leaf size and the sha256 of the CSV
+
+The tree is flattened to its leaves: a query computes the distance from the
+patient to every leaf's bounding box in one vectorized step, then scans the
+leaves nearest first and stops once the next box is farther away than the
+k-th best patient so far. Results are exact. The files are memory-mapped, so
+opening an index costs the same whatever the cohort size, and a query only
+touches the leaves it scans. ``scan`` is the blocked brute-force search,
+cheaper for large batches of queries against small cohorts.
+
+The index is built offline with ``python similar_patients.py build`` and
+rebuilt on load when the CSV has changed, like the dataset cache. A larger
+cohort CSV (the model's feature and label columns) is indexed with
+``--source``; the app uses it for a model when HEALTH_APP_NEIGHBORS_<MODEL>
+(e.g. HEALTH_APP_NEIGHBORS_HEART) is set to the same path.
+
+Usage:
+    python similar_patients.py build [--model heart] [--source cohort.csv]
+    python similar_patients.py query --model heart --rows 3 -k 5
+"""
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from dataset_cache import cache_dir, load_dataset
+from specs import SPECS, dataset_path
+
+SCHEMA_VERSION = 1
+MANIFEST = 'manifest.json'
+LEAF_SIZE = 256
+
+Case = namedtuple('Case', ['row', 'distance', 'outcome', 'values'])
+
+
+def index_dir(source):
+    return os.path.join(cache_dir(source), 'neighbors')
+
+
+def cohort_source(name, environ=os.environ):
+    """The cohort CSV set in HEALTH_APP_NEIGHBORS_<NAME>, or None for the
+    bundled dataset."""
+    return environ.get(f'HEALTH_APP_NEIGHBORS_{name.upper()}') or None
+
+
+def _save(path, name, values):
+    tmp = os.path.join(path, name + '.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp, os.path.join(path, name))
+
+
+def _kd_leaves(Z, leaf_size):
+    """Row order grouping ``Z`` into KD-tree leaves (split at the median of
+    the widest dimension), and the (start, stop) of every leaf in it."""
+    order = np.arange(len(Z))
+    leaves = []
+    stack = [(0, len(Z))]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start <= leaf_size:
+            leaves.append((start, stop))
+            continue
+        block = Z[order[start:stop]]
+        dim = np.argmax(block.max(axis=0) - block.min(axis=0))
+        mid = (stop - start) // 2
+        order[start:stop] = order[start:stop][np.argpartition(block[:, dim], mid)]
+        # left half popped first, so leaves come out in order
+        stack.append((start + mid, stop))
+        stack.append((start, start + mid))
+    return order, np.array(leaves, dtype=np.int64).reshape(-1, 2)
+
+
+def build_index(path, X, outcomes, features, digest=None, leaf_size=LEAF_SIZE):
+    """Build an index of the rows of ``X`` into the directory ``path``;
+    returns the manifest."""
+    X = np.asarray(X, dtype=np.float64)
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = ((X - mean) / scale).astype(np.float32)
+    order, leaves = _kd_leaves(Z, leaf_size)
+    points = Z[order]
+
+    os.makedirs(path, exist_ok=True)
+    _save(path, 'points.npy', points)
+    _save(path, 'rows.npy', order.astype(np.int64))
+    _save(path, 'leaves.npy', leaves)
+    _save(path, 'lower.npy', np.stack([points[a:b].min(axis=0) for a, b in leaves]))
+    _save(path, 'upper.npy', np.stack([points[a:b].max(axis=0) for a, b in leaves]))
+    _save(path, 'outcomes.npy', np.asarray(outcomes))
+    manifest = {
+        'schema_version': SCHEMA_VERSION,
+        'rows': len(X),
+        'features': list(features),
+        'mean': mean.tolist(),
+        'scale': scale.tolist(),
+        'leaf_size': leaf_size,
+        'leaves': len(leaves),
+        'source_sha256': digest,
+    }
+    # written last: a half-built index is never picked up
+    tmp = os.path.join(path, MANIFEST + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+    return manifest
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('schema_version') == SCHEMA_VERSION else None
+
+
+class NeighborIndex:
+    """Memory-mapped index opened from ``path``; ``dataset`` (a
+    dataset_cache.Dataset) supplies the feature values of ``similar`` cases."""
+
+    def __init__(self, path, manifest=None, dataset=None):
+        self.path = path
+        self.manifest = manifest or _read_manifest(path)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No neighbour index in {path}")
+        self.dataset = dataset
+        self.features = self.manifest['features']
+        self.mean = np.array(self.manifest['mean'])
+        self.scale = np.array(self.manifest['scale'])
+        arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+                  for name in ('points', 'rows', 'leaves', 'lower', 'upper', 'outcomes')}
+        self.points, self.rows, self.outcomes = arrays['points'], arrays['rows'], arrays['outcomes']
+        # one row per leaf: small, and read by every query
+        self.leaves = np.array(arrays['leaves'])
+        self.lower = np.array(arrays['lower'])
+        self.upper = np.array(arrays['upper'])
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def standardize(self, X):
+        return ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+
+    def _query_one(self, z, k, leaves_per_step=4):
+        gap = np.maximum(self.lower - z, 0)
+        np.maximum(gap, z - self.upper, out=gap)
+        bounds = np.einsum('ij,ij->i', gap, gap)
+        order = np.argsort(bounds)
+        best_d2 = np.empty(0, dtype=np.float32)
+        best_pos = np.empty(0, dtype=np.int64)
+        for step in range(0, len(order), leaves_per_step):
+            leaves = order[step:step + leaves_per_step]
+            if len(best_d2) == k and bounds[leaves[0]] > best_d2[-1]:
+                break
+            positions = np.concatenate([np.arange(a, b) for a, b in self.leaves[leaves]])
+            diff = self.points[positions] - z
+            d2 = np.concatenate([best_d2, np.einsum('ij,ij->i', diff, diff)])
+            positions = np.concatenate([best_pos, positions])
+            keep = _smallest(d2, k)
+            best_d2, best_pos = d2[keep], positions[keep]
+        return np.sqrt(best_d2.astype(np.float64)), self.rows[best_pos]
+
+    def query(self, X, k=5):
+        """Distances (in standard deviations) and cohort row numbers of the
+        ``k`` nearest patients of every row of ``X``, nearest first; both
+        (n_rows, k)."""
+        Z = np.atleast_2d(self.standardize(X))
+        k = min(k, len(self))
+        distances = np.empty((len(Z), k))
+        rows = np.empty((len(Z), k), dtype=np.int64)
+        for i, z in enumerate(Z):
+            distances[i], rows[i] = self._query_one(z, k)
+        return distances, rows
+
+    def scan(self, X, k=5, block_rows=65_536):
+        """Same result as ``query`` by blocked brute force: one matrix product
+        per block of the cohort for the whole batch of queries."""
+        Z = np.atleast_2d(self.standardize(X))
+        k = min(k, len(self))
+        z_norms = np.einsum('ij,ij->i', Z, Z)[:, None]
+        best_d2 = np.empty((len(Z), 0), dtype=np.float32)
+        best_pos = np.empty((len(Z), 0), dtype=np.int64)
+        for start in range(0, len(self), block_rows):
+            block = np.asarray(self.points[start:start + block_rows])
+            d2 = z_norms - 2 * (Z @ block.T) + np.einsum('ij,ij->i', block, block)
+            np.maximum(d2, 0, out=d2)
+            d2 = np.concatenate([best_d2, d2], axis=1)
+            block_pos = np.broadcast_to(np.arange(start, start + len(block)), (len(Z), len(block)))
+            positions = np.concatenate([best_pos, block_pos], axis=1)
+            keep = _smallest(d2, k)
+            best_d2 = np.take_along_axis(d2, keep, axis=1)
+            best_pos = np.take_along_axis(positions, keep, axis=1)
+        # the expanded product loses precision to cancellation: recompute the
+        # distances of the winners directly
+        diff = np.asarray(self.points[best_pos.ravel()]).reshape(best_pos.shape + (-1,)) - Z[:, None, :]
+        d2 = np.einsum('ijk,ijk->ij', diff, diff)
+        order = np.argsort(d2, axis=1, kind='stable')
+        best_pos = np.take_along_axis(best_pos, order, axis=1)
+        return np.sqrt(np.take_along_axis(d2, order, axis=1).astype(np.float64)), self.rows[best_pos]
+
+    def similar(self, x, k=5):
+        """The ``k`` nearest cohort patients of one row as ``Case(row,
+        distance, outcome, values)``, ``values`` in feature order."""
+        distances, rows = self.query(x, k)
+        return [Case(int(row), float(distance), self.outcomes[row].item(),
+                     tuple(self.dataset[f][row].item() for f in self.features))
+                for distance, row in zip(distances[0], rows[0])]
+
+
+def _smallest(d2, k):
+    """Indices of the k smallest values along the last axis, smallest first."""
+    if d2.shape[-1] > k:
+        part = np.argpartition(d2, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(d2.shape[-1]), d2.shape).copy()
+    order = np.argsort(np.take_along_axis(d2, part, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def build(name, source=None, leaf_size=LEAF_SIZE):
+    """(Re)build the index of ``name``'s dataset CSV (``source`` defaults to
+    the bundled dataset/ file); returns the manifest."""
+    source = source or dataset_path(name)
+    dataset = load_dataset(name, source)
+    return build_index(index_dir(source), dataset.X(), dataset.y, dataset.features,
+                       digest=dataset.digest, leaf_size=leaf_size)
+
+
+def load_index(name, source=None):
+    """Memory-map the index of ``name``'s dataset CSV, building it first if it
+    is missing or older than the CSV."""
+    source = source or dataset_path(name)
+    dataset = load_dataset(name, source)
+    path = index_dir(source)
+    manifest = _read_manifest(path)
+    if manifest is None or manifest['source_sha256'] != dataset.digest:
+        manifest = build(name, source)
+    return NeighborIndex(path, manifest, dataset)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=['build', 'query'])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append',
+                        help='dataset to process (default: all three)')
+    parser.add_argument('--source', help='cohort CSV to index instead of the bundled dataset (one --model)')
+    parser.add_argument('--leaf-size', type=int, default=LEAF_SIZE)
+    parser.add_argument('--rows', type=int, default=3, help='dataset rows to look up (query)')
+    parser.add_argument('-k', type=int, default=5)
+    args = parser.parse_args(argv)
+    names = args.model or sorted(SPECS)
+    if args.source and len(names) != 1:
+        parser.error('--source needs exactly one --model')
+
+    for name in names:
+        if args.command == 'build':
+            start = time.perf_counter()
+            manifest = build(name, args.source, args.leaf_size)
+            print(f"{name}: {manifest['rows']} rows in {manifest['leaves']} leaves, "
+                  f"built in {(time.perf_counter() - start) * 1e3:.1f} ms")
+        else:
+            index = load_index(name, args.source)
+            X = index.dataset.X()[:args.rows]
+            for x, cases in zip(X, (index.similar(x, args.k) for x in X)):
+                print(f"{name} {dict(zip(index.features, x.tolist()))}")
+                for case in cases:
+                    print(f"  row {case.row:>6}  distance {case.distance:6.3f}  {index.dataset.label} = {case.outcome}")
+
+
+if __name__ == '__main__':
+    main()
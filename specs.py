@@ -0,0 +1,111 @@
+"""Static description of the three disease models served by the app.
+
+The feature order of each spec is the column order the corresponding page in
+app.py builds ``user_input`` in, which is also the column order the models
+were trained on in the Colab notebooks. ``non_negative`` marks the pages that
+reject negative inputs (``all(x >= 0 ...)``); the Parkinson's page only
+requires every field to parse as a float.
+"""
+import math
+import os
+from collections import namedtuple
+
+working_dir = os.path.dirname(os.path.abspath(__file__))
+model_dir = os.path.join(working_dir, 'saved_models')
+dataset_dir = os.path.join(working_dir, 'dataset')
+
+DiseaseSpec = namedtuple('DiseaseSpec', ['name', 'model_file', 'dataset_file', 'label', 'features', 'labels', 'non_negative'])
+
+SPECS = {
+    'diabetes': DiseaseSpec(
+        name='diabetes',
+        model_file='diabetes_model.sav',
+        dataset_file='diabetes.csv',
+        label='Outcome',
+        features=['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness', 'Insulin', 'BMI',
+                  'DiabetesPedigreeFunction', 'Age'],
+        labels={0: 'Not Diabetic', 1: 'The Person is Diabetic'},
+        non_negative=True,
+    ),
+    'heart': DiseaseSpec(
+        name='heart',
+        model_file='heart_disease_model.sav',
+        dataset_file='heart.csv',
+        label='target',
+        features=['age', 'sex', 'cp', 'trestbps', 'chol', 'fbs', 'restecg', 'thalach', 'exang',
+                  'oldpeak', 'slope', 'ca', 'thal'],
+        labels={0: 'Does Not Have Heart Disease', 1: 'Has Heart Disease'},
+        non_negative=True,
+    ),
+    'parkinsons': DiseaseSpec(
+        name='parkinsons',
+        model_file='parkinsons_model.sav',
+        dataset_file='parkinsons.csv',
+        label='status',
+        features=['MDVP:Fo(Hz)', 'MDVP:Fhi(Hz)', 'MDVP:Flo(Hz)', 'MDVP:Jitter(%)', 'MDVP:Jitter(Abs)',
+                  'MDVP:RAP', 'MDVP:PPQ', 'Jitter:DDP', 'MDVP:Shimmer', 'MDVP:Shimmer(dB)',
+                  'Shimmer:APQ3', 'Shimmer:APQ5', 'MDVP:APQ', 'Shimmer:DDA', 'NHR',
+                  'HNR', 'RPDE', 'DFA', 'spread1', 'spread2', 'D2', 'PPE'],
+        labels={0: "The person does not have Parkinson's disease.", 1: "The person has Parkinson's disease."},
+        non_negative=False,
+    ),
+}
+
+
+def get_spec(name):
+    try:
+        return SPECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model '{name}', expected one of {sorted(SPECS)}") from None
+
+
+def model_path(name):
+    return os.path.join(model_dir, get_spec(name).model_file)
+
+
+def dataset_path(name):
+    return os.path.join(dataset_dir, get_spec(name).dataset_file)
+
+
+def check_row_type(values, what='An input row'):
+    """Raise ValueError unless ``values`` is a list, tuple or dict: a string
+    has a length too, and would be read one character per feature."""
+    if not isinstance(values, (list, tuple, dict)):
+        raise ValueError(f"{what} must be a list of values or an object keyed by name, "
+                         f"got {type(values).__name__}")
+
+
+def check_not_boolean(values, what='An input row'):
+    """Raise ValueError if any of ``values`` is a boolean, which float() would
+    otherwise read as 1.0/0.0."""
+    if any(isinstance(x, bool) for x in values):
+        raise ValueError(f"{what} must hold numbers, not true/false")
+
+
+def parse_features(name, values):
+    """Validate one input row the way the app pages do and return it as floats.
+
+    ``values`` is either a sequence in feature order or a mapping keyed by the
+    feature names. Raises ValueError for any other type, and for missing,
+    non-numeric, boolean, non-finite or (where the page requires it) negative
+    values.
+    """
+    spec = get_spec(name)
+    check_row_type(values)
+    if isinstance(values, dict):
+        missing = [f for f in spec.features if f not in values]
+        if missing:
+            raise ValueError(f"Missing features for the {name} model: {missing}")
+        values = [values[f] for f in spec.features]
+    if len(values) != len(spec.features):
+        raise ValueError(f"The {name} model expects {len(spec.features)} features, got {len(values)}")
+    check_not_boolean(values)
+    try:
+        row = [float(x) for x in values]
+    except TypeError as e:
+        raise ValueError(str(e)) from None
+    if not all(math.isfinite(x) for x in row):
+        raise ValueError("All features must be finite numbers.")
+    if spec.non_negative and not all(x >= 0 for x in row):
+        raise ValueError("Please enter valid input values.")
+    return row
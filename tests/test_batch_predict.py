@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from batch_predict import score_csv
+from specs import dataset_path
+
+
+def test_scores_every_row(tmp_path):
+    output = tmp_path / 'scored.csv'
+    stats = score_csv('heart', dataset_path('heart'), str(output), chunk_size=100)
+    scored = pd.read_csv(output)
+    assert stats['rows'] == len(scored) == len(pd.read_csv(dataset_path('heart'), encoding='utf-8-sig'))
+    assert set(scored['prediction']) <= {0, 1}
+
+
+def test_missing_columns_leave_no_output(tmp_path):
+    source = tmp_path / 'patients.csv'
+    pd.read_csv(dataset_path('heart'), encoding='utf-8-sig').drop(columns=['chol']).to_csv(source, index=False)
+    output = tmp_path / 'scored.csv'
+    with pytest.raises(ValueError, match='chol'):
+        score_csv('heart', str(source), str(output))
+    assert not output.exists()
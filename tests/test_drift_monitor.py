@@ -0,0 +1,62 @@
+import logging
+
+import numpy as np
+
+import stage_timings
+from dataset_cache import load_dataset
+from drift_monitor import DriftMonitor, ReferenceSketch, drift_scores, from_timings
+
+
+def test_identical_distribution_scores_zero():
+    shares = np.array([[0.2, 0.3, 0.5]])
+    psi, ks = drift_scores(shares * 1000, shares)
+    assert abs(psi[0]) < 1e-12
+    assert abs(ks[0]) < 1e-12
+
+
+def test_sketch_round_trips_through_json():
+    X = load_dataset('diabetes').X()
+    sketch = ReferenceSketch.from_data(X, load_dataset('diabetes').features)
+    copy = ReferenceSketch.from_json(sketch.to_json())
+    np.testing.assert_array_equal(copy.edges, sketch.edges)
+    np.testing.assert_allclose(copy.shares.sum(axis=1), 1.0)
+    np.testing.assert_array_equal(copy.count(X), sketch.count(X))
+
+
+def test_dataset_replay_is_stable_and_a_shift_is_detected():
+    X = load_dataset('diabetes').X()
+    monitor = DriftMonitor.from_datasets(['diabetes'], buffer_size=64, half_life=500)
+    monitor.observe_many('diabetes', X.tolist())
+    features = monitor.scores()['diabetes']['features']
+    assert max(s['psi'] for s in features.values()) < 0.1
+
+    monitor.observe_many('diabetes', (X + X.std(axis=0)).tolist() * 3)
+    scores = monitor.scores()['diabetes']
+    assert scores['observations'] == 4 * len(X)
+    assert min(s['psi'] for s in scores['features'].values()) > 0.25
+    assert 'health_app_input_drift_psi{model="diabetes",feature="Glucose"}' in monitor.render_prometheus()
+
+
+def test_disabled_monitor_records_nothing():
+    monitor = DriftMonitor.from_datasets(['diabetes'], enabled=False)
+    monitor.observe('diabetes', [1.0] * 8)
+    assert monitor.scores() == {}
+
+
+def test_log_summaries_reach_stderr_without_logging_configured(capfd):
+    timings = stage_timings.from_environment({'HEALTH_APP_METRICS_LOG': '3600'})
+    monitor = from_timings(timings)
+    try:
+        with timings.stage('diabetes', 'predict'):
+            pass
+        monitor.observe('diabetes', load_dataset('diabetes').X()[0].tolist())
+        timings.log_summary()
+        err = capfd.readouterr().err
+        assert 'diabetes/predict: n=1' in err
+        assert 'diabetes inputs: n=1' in err
+    finally:
+        for name in ('stage_timings', 'drift_monitor'):
+            logger = logging.getLogger(name)
+            logger.handlers.clear()
+            logger.propagate = True
+            logger.setLevel(logging.NOTSET)
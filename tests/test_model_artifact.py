@@ -0,0 +1,30 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from dataset_cache import load_dataset
+from model_artifact import ArtifactError, artifact_dir, load_artifact
+from model_registry import load_pickle
+from specs import SPECS, model_path
+
+
+@pytest.mark.parametrize('name', sorted(SPECS))
+def test_artifact_matches_the_pickled_estimator(name):
+    artifact = load_artifact(artifact_dir(name))
+    estimator = load_pickle(model_path(name))
+    X = load_dataset(name).X()
+    np.testing.assert_allclose(artifact.decision_function(X), estimator.decision_function(X), rtol=1e-6, atol=1e-6)
+    np.testing.assert_array_equal(artifact.predict(X), estimator.predict(X))
+
+
+def test_corrupted_weights_fail_verification(tmp_path):
+    path = tmp_path / 'artifact'
+    shutil.copytree(artifact_dir('diabetes'), path)
+    weights = np.load(path / 'weights.npy')
+    weights[0] += 1.0
+    np.save(path / 'weights.npy', weights)
+    with pytest.raises(ArtifactError, match='Checksum mismatch'):
+        load_artifact(str(path))
+    # verification can be skipped, and the file is then read as it is
+    assert load_artifact(str(path), verify=False).coef_[0] == weights[0]
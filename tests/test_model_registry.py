@@ -0,0 +1,64 @@
+import os
+import threading
+
+from model_registry import ModelRegistry
+
+
+def registry_for(tmp_path, text='v1'):
+    path = tmp_path / 'model.txt'
+    path.write_text(text)
+    loads = []
+
+    def loader(p):
+        loads.append(p)
+        with open(p) as f:
+            return f.read()
+
+    return ModelRegistry(loader=loader, resolve=lambda name: str(path)), path, loads
+
+
+def test_loads_once_and_counts_hits(tmp_path):
+    registry, _, loads = registry_for(tmp_path)
+    assert registry.get('m') == 'v1'
+    assert registry.get('m') == 'v1'
+    assert len(loads) == 1
+    assert registry.metrics['m']['loads'] == 1
+    assert registry.metrics['m']['hits'] == 1
+
+
+def test_reloads_when_the_file_changes(tmp_path):
+    registry, path, loads = registry_for(tmp_path)
+    _, first = registry.get_versioned('m')
+    path.write_text('version 2')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    model, second = registry.get_versioned('m')
+    assert model == 'version 2'
+    assert first != second
+    assert registry.metrics['m']['invalidations'] == 1
+
+
+def test_touched_but_unchanged_file_is_not_reloaded(tmp_path):
+    registry, path, loads = registry_for(tmp_path)
+    registry.get('m')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    registry.get('m')
+    assert len(loads) == 1
+
+
+def test_concurrent_hits_are_all_counted(tmp_path):
+    registry, _, _ = registry_for(tmp_path)
+    registry.get('m')
+    threads, per_thread = 8, 5000
+
+    def read():
+        for _ in range(per_thread):
+            registry.get('m')
+
+    workers = [threading.Thread(target=read) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert registry.metrics['m']['hits'] == threads * per_thread
@@ -0,0 +1,96 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from prediction_service import make_server
+from screening import RECORD_FIELDS
+
+HEART = [52, 1, 0, 125, 212, 0, 1, 168, 0, 1.0, 2, 2, 3]
+
+
+@pytest.fixture(scope='module')
+def server():
+    server, service = make_server(port=0, max_wait_ms=0.5, timeout=0.5)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, service
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def post(server, path, payload):
+    connection = http.client.HTTPConnection(*server[0].server_address, timeout=10)
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    connection.request('POST', path, body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+
+def test_predict(server):
+    status, body = post(server, '/predict/heart', {'features': HEART})
+    assert status == 200
+    assert body['prediction'] in (0, 1)
+    status, body = post(server, '/predict/heart', {'instances': [HEART, HEART]})
+    assert status == 200
+    assert len(body['predictions']) == 2
+
+
+@pytest.mark.parametrize('path, payload', [
+    ('/predict/heart', {'instances': []}),
+    ('/predict/heart', {'features': HEART[:-1]}),
+    ('/predict/heart', {'features': ''.join(str(i % 10) for i in range(len(HEART)))}),
+    ('/predict/heart', {'features': [True] + HEART[1:]}),
+    ('/predict/heart', {'rows': [HEART]}),
+    ('/predict/heart', b'not json'),
+    ('/screen', {'records': []}),
+    ('/screen', {'record': '1' * len(RECORD_FIELDS)}),
+])
+def test_invalid_requests_get_400(server, path, payload):
+    status, body = post(server, path, payload)
+    assert status == 400
+    assert body['error']
+
+
+def test_unknown_model_gets_404(server):
+    assert post(server, '/predict/cancer', {'features': HEART})[0] == 404
+
+
+def test_model_failure_gets_500(server):
+    batcher = server[1].batchers['heart']
+    get_model = batcher._get_model
+
+    def failing():
+        raise ValueError('weights are corrupt')
+
+    batcher._get_model = failing
+    try:
+        status, body = post(server, '/predict/heart', {'features': HEART})
+    finally:
+        batcher._get_model = get_model
+    assert status == 500
+    assert 'weights are corrupt' in body['error']
+
+
+def test_slow_model_gets_503(server):
+    batcher = server[1].batchers['heart']
+    get_model = batcher._get_model
+
+    def slow():
+        time.sleep(1.0)
+        return get_model()
+
+    batcher._get_model = slow
+    try:
+        status, body = post(server, '/predict/heart', {'features': HEART})
+    finally:
+        batcher._get_model = get_model
+        time.sleep(1.0)
+    assert status == 503
+    # the handler survived: the next request is answered
+    assert post(server, '/predict/heart', {'features': HEART})[0] == 200
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from run_benchmarks import THRESHOLDS, compare  # noqa: E402
+
+
+def run(calibration_s, predict_us, rerun_ms, rows_per_s):
+    return {
+        'calibration_s': calibration_s,
+        'groups': {
+            'predict': {'heart/artifact_us': {'value': predict_us, 'better': 'lower'}},
+            'rerun': {'Home/median_ms': {'value': rerun_ms, 'better': 'lower'}},
+            'batch': {'heart/artifact_rows_per_s': {'value': rows_per_s, 'better': 'higher'}},
+        },
+    }
+
+
+def slowdowns(results, baseline):
+    rows, regressions = compare(results, baseline, THRESHOLDS)
+    return {group: slowdown for group, _, _, _, slowdown in rows}, [row[0] for row in regressions]
+
+
+def test_faster_machine_scales_cpu_groups_only():
+    # calibration twice as fast, CPU-bound timings twice as fast, rerun unchanged
+    baseline = run(1.0, 10.0, 30.5, 1e6)
+    results = run(0.5, 5.0, 33.1, 2e6)
+    slowdown, regressions = slowdowns(results, baseline)
+    assert abs(slowdown['predict']) < 1e-9
+    assert abs(slowdown['batch']) < 1e-9
+    assert abs(slowdown['rerun'] - (33.1 / 30.5 - 1)) < 1e-9
+    assert regressions == []
+
+
+def test_cpu_regression_is_reported_after_calibration():
+    baseline = run(1.0, 10.0, 30.0, 1e6)
+    results = run(0.5, 10.0, 30.0, 1e6)
+    _, regressions = slowdowns(results, baseline)
+    assert sorted(regressions) == ['batch', 'predict']
+
+
+def test_rerun_regression_is_reported():
+    _, regressions = slowdowns(run(1.0, 10.0, 50.0, 1e6), run(1.0, 10.0, 30.0, 1e6))
+    assert regressions == ['rerun']
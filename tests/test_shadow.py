@@ -0,0 +1,52 @@
+import numpy as np
+
+from dataset_cache import load_dataset
+from model_artifact import load_model, resolve_model_path
+from shadow import ShadowEvaluator, read_log, replay
+
+
+def heart_model():
+    return load_model(resolve_model_path('heart'))
+
+
+def evaluator(log_path, model):
+    return ShadowEvaluator('heart', lambda: (model, 'v'), model, str(log_path))
+
+
+def test_records_are_logged_and_replayed(tmp_path):
+    model = heart_model()
+    X = load_dataset('heart').X()[:10]
+    shadow = evaluator(tmp_path / 'heart.shadow', model)
+    shadow.submit(X.tolist())
+    shadow.close()
+
+    header, records = read_log(str(tmp_path / 'heart.shadow'))
+    assert header['model'] == 'heart'
+    np.testing.assert_array_equal(records['x'], X)
+    result = replay(str(tmp_path / 'heart.shadow'), model, model)
+    assert result['rows'] == 10
+    assert result['disagreements'] == 0
+
+
+def test_partial_record_is_dropped_on_restart(tmp_path):
+    model = heart_model()
+    X = load_dataset('heart').X()[:6]
+    log_path = tmp_path / 'heart.shadow'
+    shadow = evaluator(log_path, model)
+    shadow.submit(X[:3].tolist())
+    shadow.close()
+    # a crash in the middle of a write
+    with open(log_path, 'ab') as f:
+        f.write(b'\x5a' * 17)
+
+    shadow = evaluator(log_path, model)
+    shadow.submit(X[3:].tolist())
+    shadow.close()
+
+    _, records = read_log(str(log_path))
+    assert len(records) == 6
+    np.testing.assert_array_equal(records['x'], X)
+    labels = model.predict(X)
+    np.testing.assert_array_equal(records['primary_label'], labels)
+    assert (records['time'] > 1e9).all()
+    assert replay(str(log_path), model, model)['rows'] == 6
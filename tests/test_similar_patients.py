@@ -0,0 +1,38 @@
+import numpy as np
+
+from dataset_cache import load_dataset
+from similar_patients import NeighborIndex, build_index, cohort_source
+
+
+def test_query_is_exact(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, 6))
+    y = rng.integers(0, 2, len(X))
+    build_index(str(tmp_path), X, y, [f'f{j}' for j in range(6)], leaf_size=32)
+    index = NeighborIndex(str(tmp_path))
+    queries = rng.normal(size=(20, 6))
+    distances, rows = index.query(queries, k=5)
+
+    Z = (X - X.mean(axis=0)) / X.std(axis=0)
+    Q = (queries - X.mean(axis=0)) / X.std(axis=0)
+    brute = np.sqrt(((Q[:, None, :] - Z[None, :, :]) ** 2).sum(axis=2))
+    np.testing.assert_array_equal(rows, np.argsort(brute, axis=1)[:, :5])
+    np.testing.assert_allclose(distances, np.sort(brute, axis=1)[:, :5], rtol=1e-5)
+    np.testing.assert_array_equal(index.scan(queries, k=5)[1], rows)
+
+
+def test_cohort_source_comes_from_the_environment(tmp_path):
+    assert cohort_source('heart', {}) is None
+    assert cohort_source('heart', {'HEALTH_APP_NEIGHBORS_HEART': 'cohort.csv'}) == 'cohort.csv'
+    assert cohort_source('diabetes', {'HEALTH_APP_NEIGHBORS_HEART': 'cohort.csv'}) is None
+
+
+def test_similar_cases_of_a_dataset_row_start_with_itself(tmp_path):
+    dataset = load_dataset('diabetes')
+    build_index(str(tmp_path), dataset.X(), dataset.y, dataset.features)
+    index = NeighborIndex(str(tmp_path), dataset=dataset)
+    row = 17
+    cases = index.similar(dataset.X()[row], k=3)
+    assert cases[0].distance == 0.0
+    assert cases[0].values == tuple(dataset.X()[cases[0].row].tolist())
+    assert [case.distance for case in cases] == sorted(case.distance for case in cases)
@@ -0,0 +1,39 @@
+import pytest
+
+from screening import RECORD_FIELDS, parse_records
+from specs import get_spec, parse_features
+
+DIABETES = [6, 148, 72, 35, 0, 33.6, 0.627, 50]
+
+
+def test_row_in_feature_order_and_by_name():
+    assert parse_features('diabetes', DIABETES) == [float(x) for x in DIABETES]
+    by_name = dict(zip(get_spec('diabetes').features, DIABETES))
+    assert parse_features('diabetes', by_name) == parse_features('diabetes', DIABETES)
+
+
+@pytest.mark.parametrize('values', ['12345678', b'12345678', 12345678, None, {6, 148, 72, 35, 0, 33.6, 0.627, 50}])
+def test_rejects_anything_but_a_list_or_mapping(values):
+    with pytest.raises(ValueError):
+        parse_features('diabetes', values)
+
+
+def test_rejects_booleans():
+    with pytest.raises(ValueError, match='true/false'):
+        parse_features('diabetes', [True, False] + DIABETES[2:])
+
+
+@pytest.mark.parametrize('values', [DIABETES[:-1], DIABETES[:-1] + ['abc'], DIABETES[:-1] + [float('nan')],
+                                    DIABETES[:-1] + [-1], DIABETES[:-1] + [[1]]])
+def test_rejects_invalid_rows(values):
+    with pytest.raises(ValueError):
+        parse_features('diabetes', values)
+
+
+def test_screening_records_are_validated_the_same_way():
+    record = [1.0] * len(RECORD_FIELDS)
+    assert parse_records([record]).shape == (1, len(RECORD_FIELDS))
+    with pytest.raises(ValueError):
+        parse_records(['1' * len(RECORD_FIELDS)])
+    with pytest.raises(ValueError, match='true/false'):
+        parse_records([[True] + record[1:]])
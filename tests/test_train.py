@@ -0,0 +1,35 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+from model_registry import file_digest
+from specs import dataset_path, get_spec, model_path
+from train import RANDOM_STATE, hold_out, load_training_data, update_rarity
+
+
+def test_hold_out_reproduces_each_notebook():
+    for name, stratify in (('diabetes', True), ('heart', True), ('parkinsons', False)):
+        X, Y = load_training_data(name)
+        expected = train_test_split(X, Y, test_size=0.2, stratify=Y if stratify else None,
+                                    random_state=RANDOM_STATE)
+        for part, want in zip(hold_out(name, X, Y), expected):
+            assert list(part.index) == list(want.index)
+
+
+def test_rarity_update_refits_without_touching_the_served_model():
+    served = file_digest(model_path('heart'))
+    artifact = os.path.join(os.path.dirname(model_path('heart')), 'heart_disease_model', 'manifest.json')
+    served_manifest = file_digest(artifact)
+    spec = get_spec('heart')
+    rows = pd.read_csv(dataset_path('heart'), encoding='utf-8-sig').sample(40, random_state=0)
+
+    model, report = update_rarity('heart', rows[spec.features], rows[spec.label])
+
+    assert report['added_rows'] == 40
+    assert report['rarity_rows'] == model.named_steps['rarity'].weights_.counts[0].sum()
+    assert 0.5 < report['test_accuracy'] <= 1.0
+    assert np.isfinite(model.decision_function(rows[spec.features])).all()
+    assert file_digest(model_path('heart')) == served
+    assert file_digest(artifact) == served_manifest
@@ -0,0 +1,62 @@
+import csv
+import io
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+from voice_features import FEATURES, VoiceFeatureError, extract, extract_wav, score_recordings, synthesize
+
+RATE = 44_100
+
+
+def wav_bytes(x, rate=RATE):
+    out = io.BytesIO()
+    wavfile.write(out, rate, (x * 20_000).astype(np.int16))
+    return out.getvalue()
+
+
+@pytest.mark.parametrize('f0, jitter, shimmer', [(110.0, 0.01, 0.05), (220.0, 0.003, 0.02)])
+def test_recovers_pitch_jitter_and_shimmer(f0, jitter, shimmer):
+    x, periods, amplitudes = synthesize(f0, jitter, shimmer, rate=RATE)
+    features = dict(zip(FEATURES, extract(x, RATE)))
+    assert features['MDVP:Fo(Hz)'] == pytest.approx(1 / periods.mean(), rel=0.02)
+    assert features['MDVP:Jitter(%)'] == pytest.approx(np.abs(np.diff(periods)).mean() / periods.mean(), rel=0.15)
+    assert features['MDVP:Shimmer'] == pytest.approx(np.abs(np.diff(amplitudes)).mean() / amplitudes.mean(),
+                                                     rel=0.15)
+    assert all(np.isfinite(v) for v in features.values())
+
+
+def test_wav_round_trip():
+    x, _, _ = synthesize(seconds=1.0)
+    features = extract_wav(io.BytesIO(wav_bytes(x)))
+    assert len(features) == len(FEATURES)
+
+
+@pytest.mark.parametrize('length', [0, 4, 12, 20, 30, 40, 44, 60])
+def test_truncated_wav_raises_voice_feature_error(length):
+    x, _, _ = synthesize(seconds=0.5)
+    with pytest.raises(VoiceFeatureError):
+        extract_wav(io.BytesIO(wav_bytes(x)[:length]))
+
+
+def test_silence_raises_voice_feature_error():
+    with pytest.raises(VoiceFeatureError):
+        extract(np.zeros(RATE), RATE)
+
+
+def test_a_bad_file_fails_only_its_row(tmp_path):
+    x, _, _ = synthesize(seconds=1.0)
+    good = tmp_path / 'good.wav'
+    good.write_bytes(wav_bytes(x))
+    bad = tmp_path / 'bad.wav'
+    bad.write_bytes(wav_bytes(x)[:30])
+    output = tmp_path / 'scored.csv'
+    stats = score_recordings([str(good), str(bad), str(good)], str(output), workers=1)
+    assert stats['recordings'] == 3
+    assert stats['failed'] == 1
+    with open(output) as f:
+        rows = list(csv.DictReader(f))
+    assert [row['file'] for row in rows] == [str(good), str(bad), str(good)]
+    assert rows[1]['error'].startswith('Not a readable WAV file')
+    assert rows[0]['prediction'] in ('0', '1') and rows[0]['error'] == ''
@@ -0,0 +1,216 @@
+"""Headless training of the three disease models.
+
+Replaces the Colab notebooks in colab_files_to_train_models/. For each model it
+reads the CSV from dataset/ (or ``--data-dir``), holds out 20% of the rows
+exactly as its notebook does (``test_size=0.2, random_state=2``, stratified
+on the label for diabetes and heart but not for Parkinson's), and runs a
+k-fold cross-validated grid search over the regularization strength of the
+notebook's estimator, with the folds and candidates fitted in parallel by
+joblib across ``--jobs`` processes. ``--rarity`` puts the
+symptom-rarity weighting of rarity.py in front of the estimator.
+
+Every run writes a version directory ``saved_models/versions/<model>/<version>/``
+containing the pickled estimator, its memory-mapped artifact (see
+model_artifact.py) and a JSON report with timings and accuracies. With
+``--promote`` the new model also replaces the .sav file and artifact the app
+serves.
+
+Usage:
+    python train.py                      # all three models, 5 folds, all cores
+    python train.py --model heart --folds 10 --jobs 8 --promote
+    python train.py --model heart --rarity
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import shutil
+import time
+
+import pandas as pd
+from sklearn import svm
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+
+from dataset_cache import load_dataset
+from linear_model import LinearPredictor
+from model_artifact import MANIFEST, artifact_dir, read_manifest, write_artifact
+from model_registry import load_pickle
+from rarity import RarityTransformer
+from specs import SPECS, dataset_dir, get_spec, model_dir, model_path
+
+RANDOM_STATE = 2
+# the notebooks stratify the hold-out split of these models only
+STRATIFIED = {'diabetes', 'heart'}
+
+
+def make_search(name, folds, jobs, rarity=False):
+    """The notebook's estimator wrapped in a grid search over C.
+
+    With ``rarity`` the estimator is fed rarity-weighted features (see
+    rarity.py); the weight tables are fitted inside each fold.
+    """
+    if name == 'heart':
+        estimator = LogisticRegression(max_iter=5000)
+        grid = {'C': [0.01, 0.1, 1.0, 10.0]}
+    else:
+        estimator = svm.SVC(kernel='linear')
+        grid = {'C': [0.1, 1.0]}
+    if rarity:
+        estimator = Pipeline([('rarity', RarityTransformer()), ('model', estimator)])
+        grid = {'model__' + key: values for key, values in grid.items()}
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+    return GridSearchCV(estimator, grid, cv=cv, scoring='accuracy', n_jobs=jobs, refit=True)
+
+
+def load_training_data(name, data_dir=dataset_dir):
+    spec = get_spec(name)
+    dataset = load_dataset(name, os.path.join(data_dir, spec.dataset_file))
+    return dataset.frame(spec.features), pd.Series(dataset.y, name=spec.label)
+
+
+def hold_out(name, X, Y):
+    """(X_train, X_test, Y_train, Y_test): the notebook's 20% hold-out split."""
+    return train_test_split(X, Y, test_size=0.2, stratify=Y if name in STRATIFIED else None,
+                            random_state=RANDOM_STATE)
+
+
+def train_model(name, data_dir=dataset_dir, folds=5, jobs=-1, rarity=False):
+    """Fit one model; returns (fitted estimator, report dict)."""
+    load_start = time.perf_counter()
+    X, Y = load_training_data(name, data_dir)
+    X_train, X_test, Y_train, Y_test = hold_out(name, X, Y)
+    load_seconds = time.perf_counter() - load_start
+
+    search = make_search(name, folds, jobs, rarity)
+    fit_start = time.perf_counter()
+    search.fit(X_train, Y_train)
+    fit_seconds = time.perf_counter() - fit_start
+    model = search.best_estimator_
+
+    best = search.best_index_
+    report = {
+        'model': name,
+        'estimator': type(model).__name__ if not rarity else type(model.named_steps['model']).__name__,
+        'rarity': rarity,
+        'rows': len(X),
+        'folds': folds,
+        'best_params': search.best_params_,
+        'cv_accuracy_mean': float(search.cv_results_['mean_test_score'][best]),
+        'cv_accuracy_std': float(search.cv_results_['std_test_score'][best]),
+        'train_accuracy': float(accuracy_score(Y_train, model.predict(X_train))),
+        'test_accuracy': float(accuracy_score(Y_test, model.predict(X_test))),
+        'load_seconds': load_seconds,
+        'search_seconds': fit_seconds,
+        'candidates': [
+            {'params': params, 'cv_accuracy_mean': float(mean), 'mean_fit_seconds': float(fit_time)}
+            for params, mean, fit_time in zip(search.cv_results_['params'],
+                                              search.cv_results_['mean_test_score'],
+                                              search.cv_results_['mean_fit_time'])
+        ],
+    }
+    return model, report
+
+
+def update_rarity(name, X_new, Y_new, data_dir=dataset_dir):
+    """Add labelled rows to the rarity tables of the served model of ``name``
+    and refit its estimator on the reweighted features (the dataset's
+    training split plus the new rows, with the served hyperparameters);
+    returns (fitted estimator, report dict). The served model is not touched:
+    save the result with ``save_version`` and ``promote`` it."""
+    served = load_pickle(model_path(name))
+    if list(getattr(served, 'named_steps', {})) != ['rarity', 'model']:
+        raise ValueError(f"The {name} model was not trained with rarity weighting")
+    X_new = pd.DataFrame(X_new, columns=get_spec(name).features)
+    Y_new = pd.Series(Y_new, name=get_spec(name).label).reset_index(drop=True)
+    rarity = copy.deepcopy(served.named_steps['rarity'])
+    rarity.weights_.update(X_new.to_numpy(dtype=float))
+
+    load_start = time.perf_counter()
+    X, Y = load_training_data(name, data_dir)
+    X_train, X_test, Y_train, Y_test = hold_out(name, X, Y)
+    X_fit = pd.concat([X_train, X_new], ignore_index=True)
+    Y_fit = pd.concat([Y_train.reset_index(drop=True), Y_new], ignore_index=True)
+    load_seconds = time.perf_counter() - load_start
+
+    fit_start = time.perf_counter()
+    estimator = clone(served.named_steps['model']).fit(rarity.transform(X_fit), Y_fit)
+    fit_seconds = time.perf_counter() - fit_start
+    model = Pipeline([('rarity', rarity), ('model', estimator)])
+
+    report = {
+        'model': name,
+        'estimator': type(estimator).__name__,
+        'rarity': True,
+        'rows': len(X),
+        'added_rows': len(X_new),
+        'rarity_rows': int(rarity.weights_.counts[0].sum()),
+        'params': {key: value for key, value in estimator.get_params().items() if key == 'C'},
+        'train_accuracy': float(accuracy_score(Y_fit, model.predict(X_fit))),
+        'test_accuracy': float(accuracy_score(Y_test, model.predict(X_test))),
+        'served_test_accuracy': float(accuracy_score(Y_test, served.predict(X_test))),
+        'load_seconds': load_seconds,
+        'fit_seconds': fit_seconds,
+    }
+    return model, report
+
+
+def save_version(name, model, report, version=None):
+    """Write the model, its artifact and the report to a new version directory."""
+    version = version or time.strftime('%Y%m%d-%H%M%S')
+    stem = os.path.splitext(get_spec(name).model_file)[0]
+    path = os.path.join(model_dir, 'versions', stem, version)
+    os.makedirs(path, exist_ok=True)
+
+    sav = os.path.join(path, get_spec(name).model_file)
+    with open(sav, 'wb') as f:
+        pickle.dump(model, f)
+    write_artifact(os.path.join(path, stem), LinearPredictor.from_estimator(model), get_spec(name).features,
+                   report['estimator'], source=sav, metadata={'version': version, **report})
+    with open(os.path.join(path, 'report.json'), 'w') as f:
+        json.dump({'version': version, **report}, f, indent=2)
+    return path
+
+
+def promote(name, version_path):
+    """Make a saved version the one the app serves."""
+    stem = os.path.splitext(get_spec(name).model_file)[0]
+    shutil.copyfile(os.path.join(version_path, get_spec(name).model_file), model_path(name))
+    live = artifact_dir(name)
+    os.makedirs(live, exist_ok=True)
+    # the manifest goes last: its change is what makes the registry reload
+    files = list(read_manifest(os.path.join(version_path, stem))['checksums']) + [MANIFEST]
+    for f in files:
+        tmp = os.path.join(live, f + '.tmp')
+        shutil.copyfile(os.path.join(version_path, stem, f), tmp)
+        os.replace(tmp, os.path.join(live, f))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--model', choices=sorted(SPECS), action='append',
+                        help='model to train (default: all three)')
+    parser.add_argument('--data-dir', default=dataset_dir, help='directory with the dataset CSVs')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel joblib workers (-1 = all cores)')
+    parser.add_argument('--rarity', action='store_true', help='train on rarity-weighted features')
+    parser.add_argument('--promote', action='store_true', help='replace the models the app serves')
+    args = parser.parse_args(argv)
+
+    for name in args.model or sorted(SPECS):
+        model, report = train_model(name, args.data_dir, args.folds, args.jobs, args.rarity)
+        path = save_version(name, model, report)
+        if args.promote:
+            promote(name, path)
+        print(f"{name}: {report['estimator']}{report['best_params']} "
+              f"cv {report['cv_accuracy_mean']:.3f}±{report['cv_accuracy_std']:.3f}, "
+              f"train {report['train_accuracy']:.3f}, test {report['test_accuracy']:.3f}, "
+              f"search {report['search_seconds']:.1f}s -> {path}{' (promoted)' if args.promote else ''}")
+
+
+if __name__ == '__main__':
+    main()